@@ -0,0 +1,28 @@
+"""add posts created_at id index
+
+Revision ID: 9c3e5a1f7b20
+Revises: 1d6260347345
+Create Date: 2026-10-18 10:12:41.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3e5a1f7b20'
+down_revision: Union[str, Sequence[str], None] = '1d6260347345'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_posts_created_at_id', 'posts', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_posts_created_at_id', table_name='posts')
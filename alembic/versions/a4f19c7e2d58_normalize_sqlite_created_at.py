@@ -0,0 +1,38 @@
+"""normalize sqlite created_at
+
+Revision ID: a4f19c7e2d58
+Revises: f3c8d91a6b57
+Create Date: 2026-10-18 19:12:44.207113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from app.models import SQLITE_TIMESTAMP_DDL
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4f19c7e2d58'
+down_revision: Union[str, Sequence[str], None] = 'f3c8d91a6b57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    # rows written by the server default before the trigger existed
+    for table in ('posts', 'comments'):
+        op.execute(f"UPDATE {table} SET created_at = created_at || '.000000' WHERE length(created_at) = 19")
+    for statement in SQLITE_TIMESTAMP_DDL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table in ('posts', 'comments'):
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_created_at_format')
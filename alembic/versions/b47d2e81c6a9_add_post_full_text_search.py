@@ -0,0 +1,43 @@
+"""add post full text search
+
+Revision ID: b47d2e81c6a9
+Revises: 9c3e5a1f7b20
+Create Date: 2026-10-18 11:02:17.846392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from app.search import SQLITE_DDL, SQLITE_DROP_DDL, POSTGRES_DDL
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b47d2e81c6a9'
+down_revision: Union[str, Sequence[str], None] = '9c3e5a1f7b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_DDL:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        for statement in POSTGRES_DDL:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in ('posts_fts_ai', 'posts_fts_ad', 'posts_fts_au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        for statement in SQLITE_DROP_DDL:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_posts_search_vector')
+        op.execute('ALTER TABLE posts DROP COLUMN IF EXISTS search_vector')
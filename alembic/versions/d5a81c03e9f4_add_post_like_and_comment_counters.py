@@ -0,0 +1,35 @@
+"""add post like and comment counters
+
+Revision ID: d5a81c03e9f4
+Revises: b47d2e81c6a9
+Create Date: 2026-10-18 12:31:05.118730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a81c03e9f4'
+down_revision: Union[str, Sequence[str], None] = 'b47d2e81c6a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('posts', sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('posts', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        'UPDATE posts SET '
+        'like_count = (SELECT count(*) FROM likes WHERE likes.post_id = posts.id), '
+        'comment_count = (SELECT count(*) FROM comments WHERE comments.post_id = posts.id)'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('posts', 'comment_count')
+    op.drop_column('posts', 'like_count')
@@ -0,0 +1,36 @@
+"""add foreign key and filter indexes
+
+Revision ID: f3c8d91a6b57
+Revises: e2b7f4c19a03
+Create Date: 2026-10-18 17:41:09.532870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8d91a6b57'
+down_revision: Union[str, Sequence[str], None] = 'e2b7f4c19a03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_posts_author_id_created_at', 'posts', ['author_id', 'created_at'], unique=False)
+    op.create_index('ix_comments_post_id_created_at', 'comments', ['post_id', 'created_at'], unique=False)
+    op.create_index('ix_comments_user_id', 'comments', ['user_id'], unique=False)
+    op.create_index('ix_likes_post_id_id', 'likes', ['post_id', 'id'], unique=False)
+    op.create_index(op.f('ix_refresh_tokens_user_id'), 'refresh_tokens', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_refresh_tokens_user_id'), table_name='refresh_tokens')
+    op.drop_index('ix_likes_post_id_id', table_name='likes')
+    op.drop_index('ix_comments_user_id', table_name='comments')
+    op.drop_index('ix_comments_post_id_created_at', table_name='comments')
+    op.drop_index('ix_posts_author_id_created_at', table_name='posts')
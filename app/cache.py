@@ -0,0 +1,179 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dotenv import load_dotenv
+from . import metrics
+import asyncio, json, os, secrets, time
+
+load_dotenv()
+CACHE_URL = os.getenv('CACHE_URL', 'memory://')
+CACHE_TTL = float(os.getenv('CACHE_TTL', 60))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 10000))
+
+hits = metrics.counter('cache_hits_total', 'Reads answered from the response cache')
+misses = metrics.counter('cache_misses_total', 'Reads that had to go to the database')
+coalesced = metrics.counter('cache_coalesced_total', 'Misses that waited on an in-flight load instead of querying')
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    async def get(self, key:str):
+        ...
+
+    @abstractmethod
+    async def set(self, key:str, value, ttl:float):
+        ...
+
+    @abstractmethod
+    async def delete(self, *keys:str):
+        ...
+
+    @abstractmethod
+    async def clear(self):
+        ...
+
+
+class MemoryCache(CacheBackend):
+    """Per-process LRU with a TTL on every entry."""
+
+    def __init__(self, max_entries:int=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    async def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key, value, ttl):
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.entries.pop(key, None)
+
+    async def clear(self):
+        self.entries.clear()
+
+
+class RedisCache(CacheBackend):
+    """Shared cache on anything speaking the Redis protocol; values are JSON."""
+
+    def __init__(self, url:str=None, client=None, prefix:str='blog:'):
+        if client is None:
+            # optional dependency, only needed when CACHE_URL points at redis
+            from redis.asyncio import from_url
+            client = from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key):
+        raw = await self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key, value, ttl):
+        await self.client.set(self.prefix + key, json.dumps(value, default=str), px=int(ttl * 1000))
+
+    async def delete(self, *keys):
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    async def clear(self):
+        keys = [key async for key in self.client.scan_iter(match=self.prefix + '*')]
+        if keys:
+            await self.client.delete(*keys)
+
+
+def make_cache(url:str) -> CacheBackend:
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCache(url)
+    return MemoryCache()
+
+backend = make_cache(CACHE_URL)
+in_flight = {}
+
+def namespace(key:str):
+    return key.split(':', 1)[0]
+
+def invalidated_key(key:str):
+    return f'invalidated:{key}'
+
+async def settled(key:str, lag:float):
+    """Whether ``key`` has not been invalidated in the last ``lag`` seconds."""
+    stamp = await backend.get(invalidated_key(key))
+    return stamp is None or time.time() - stamp >= lag
+
+async def cached(key:str, loader, ttl:float=CACHE_TTL, lag:float=0, family:str=None):
+    """Read-through: return the cached value for ``key`` or ``await loader()``.
+
+    Concurrent misses on the same key share one load (single-flight). ``None``
+    results are not cached, and a load that raced an ``invalidate`` is
+    returned but not stored. ``lag`` is how far the loader's data may trail
+    the primary (replica reads): such a load is only stored once ``family``
+    (``key`` itself by default) was last invalidated longer ago than that,
+    so a lagging row never replaces a fresh invalidation. Lagging loads
+    never share a flight with primary ones.
+    """
+    value = await backend.get(key)
+    if value is not None:
+        hits.inc(namespace=namespace(key))
+        return value
+
+    flight = (key, lag > 0)
+    pending = in_flight.get(flight)
+    if pending is not None:
+        coalesced.inc(namespace=namespace(key))
+        return await asyncio.shield(pending)
+
+    misses.inc(namespace=namespace(key))
+    pending = in_flight[flight] = asyncio.ensure_future(loader())
+    try:
+        value = await asyncio.shield(pending)
+    finally:
+        # invalidate() drops the in-flight entry, so a mismatch means stale
+        fresh = in_flight.get(flight) is pending
+        if fresh:
+            del in_flight[flight]
+    if value is not None and fresh and (not lag or await settled(family or key, lag)):
+        await backend.set(key, value, ttl)
+    return value
+
+async def invalidate(*keys:str):
+    """Drop ``keys`` and remember when, for lagging loads (see ``cached``).
+
+    The stamps live for CACHE_TTL, so ``lag`` must stay below it.
+    """
+    now = time.time()
+    for key in keys:
+        in_flight.pop((key, False), None)
+        in_flight.pop((key, True), None)
+        await backend.set(invalidated_key(key), now, CACHE_TTL)
+    await backend.delete(*keys)
+
+async def generation(key:str, ttl:float=CACHE_TTL):
+    """Current generation token for a family of keys stored under ``key``.
+
+    Paged reads embed it in their cache keys, so ``invalidate(key)`` retires
+    every page at once; the orphaned pages simply age out.
+    """
+    token = await backend.get(key)
+    if token is None:
+        token = secrets.token_hex(4)
+        await backend.set(key, token, ttl)
+    return token
+
+def post_keys(post_id:int=None, slug:str=None):
+    keys = []
+    if slug is not None:
+        keys.append(f'post:{slug}')
+    if post_id is not None:
+        keys += [f'comments:{post_id}', f'likes:{post_id}']
+    return keys
@@ -0,0 +1,68 @@
+from sqlalchemy import select, update, delete, func, or_
+from .database import engine
+from .models import Posts, Comments, Likes, RefreshTokens
+from .indexes import audit_indexes
+from datetime import datetime, timezone
+import argparse
+
+def reconcile_counters(connection, batch_size:int=1000):
+    """Recompute ``Posts.like_count``/``comment_count`` from the source tables.
+
+    Works through posts in id ranges, one transaction per batch, and only
+    rewrites rows whose stored counters drifted. Returns the number fixed.
+    """
+    likes = select(func.count(Likes.id)).where(Likes.post_id == Posts.id).scalar_subquery()
+    comments = select(func.count(Comments.id)).where(Comments.post_id == Posts.id).scalar_subquery()
+    fixed = 0
+    last_id = 0
+    while True:
+        batch = select(Posts.id).where(Posts.id > last_id).order_by(Posts.id).limit(batch_size).subquery()
+        upper = connection.scalar(select(func.max(batch.c.id)))
+        if upper is None:
+            return fixed
+        result = connection.execute(
+            update(Posts)
+            .where(Posts.id > last_id, Posts.id <= upper, or_(Posts.like_count != likes, Posts.comment_count != comments))
+            .values({Posts.like_count:likes, Posts.comment_count:comments, Posts.updated_at:Posts.updated_at})
+        )
+        connection.commit()
+        fixed += result.rowcount
+        last_id = upper
+
+def prune_refresh_tokens(connection):
+    """Delete refresh tokens that expired or were revoked; returns the count.
+
+    Spent-but-live tokens are kept so reuse detection still sees them.
+    """
+    now = datetime.now(timezone.utc)
+    result = connection.execute(delete(RefreshTokens).where(or_(RefreshTokens.expires_at <= now, RefreshTokens.revoked_at.is_not(None))))
+    connection.commit()
+    return result.rowcount
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m app.cli')
+    commands = parser.add_subparsers(dest='command', required=True)
+    reconcile = commands.add_parser('reconcile-counters', help='backfill or repair post like/comment counters')
+    reconcile.add_argument('--batch-size', type=int, default=1000)
+    commands.add_parser('prune-refresh-tokens', help='delete expired and revoked refresh tokens')
+    commands.add_parser('audit-indexes', help='report query patterns and foreign keys without a supporting index')
+    args = parser.parse_args(argv)
+
+    if args.command == 'reconcile-counters':
+        with engine.connect() as connection:
+            fixed = reconcile_counters(connection, args.batch_size)
+        print(f'reconciled {fixed} posts')
+    elif args.command == 'prune-refresh-tokens':
+        with engine.connect() as connection:
+            pruned = prune_refresh_tokens(connection)
+        print(f'pruned {pruned} refresh tokens')
+    elif args.command == 'audit-indexes':
+        gaps = audit_indexes(engine)
+        for table, columns, reason in gaps:
+            print(f"missing index on {table}({', '.join(columns)}): {reason}")
+        if gaps:
+            raise SystemExit(1)
+        print('every declared query pattern has an index')
+
+if __name__ == '__main__':
+    main()
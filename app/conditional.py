@@ -0,0 +1,61 @@
+from fastapi import Request, Response
+from starlette import status
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import datetime, timezone
+import hashlib
+
+def make_etag(*parts):
+    digest = hashlib.sha1(':'.join(map(str, parts)).encode()).hexdigest()[:24]
+    return f'"{digest}"'
+
+def http_date(value:datetime | None):
+    if value is None:
+        return None
+    # SQLite hands back naive datetimes; everything is stored as UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+def post_validators(post_id:int, created_at, updated_at, comment_count:int, latest_comment_at, *variant):
+    """``(etag, last_modified)`` for a post as served by ``GET /posts/{slug}``.
+
+    The body embeds comments, so it changes when the post is edited or a
+    comment is added, whichever was later. ``variant`` holds the query
+    parameters that shape the body, so each representation gets its own ETag.
+    """
+    changed = max(filter(None, (created_at, updated_at, latest_comment_at)), default=None)
+    return make_etag('post', post_id, changed.isoformat() if changed else '', comment_count, *variant), http_date(changed)
+
+def comment_validators(post_id:int, total:int, latest, latest_id:int | None, *variant):
+    """``(etag, last_modified)`` for a page of ``GET /posts/{post_id}/comments``."""
+    return make_etag('comments', post_id, total, latest.isoformat() if latest else '', latest_id, *variant), http_date(latest)
+
+def is_conditional(request:Request):
+    return 'if-none-match' in request.headers or 'if-modified-since' in request.headers
+
+def not_modified(request:Request, etag:str, last_modified:str | None):
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        # If-None-Match uses the weak comparison and wins over If-Modified-Since
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return parsedate_to_datetime(last_modified) <= since
+
+def validator_headers(etag:str, last_modified:str | None):
+    headers = {'ETag':etag}
+    if last_modified:
+        headers['Last-Modified'] = last_modified
+    return headers
+
+def not_modified_response(etag:str, last_modified:str | None):
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag, last_modified))
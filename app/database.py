@@ -1,15 +1,128 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from dotenv import load_dotenv
-import os
+from . import metrics
+import os, time
 
 load_dotenv()
 DATABASE_URL = os.getenv('DATABASE_URL')
 
-engine = create_engine(DATABASE_URL)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 30000))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
+ASYNC_DRIVERS = {'sqlite':'aiosqlite', 'postgresql':'asyncpg'}
+
+pool_checkout_wait = metrics.histogram('db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection')
+pool_in_use = metrics.gauge('db_pool_connections_in_use', 'Connections currently checked out of the pool')
+
+def to_async_url(url):
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        return url
+    return url.set(drivername=f'{url.get_backend_name()}+{driver}')
+
+
+class TimedPoolMixin:
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - started, engine=self.logging_name or 'default')
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+    cursor.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.close()
+
+def engine_options(url, is_async:bool, name:str):
+    backend = url.get_backend_name()
+    options = {'pool_pre_ping':DB_POOL_PRE_PING, 'pool_logging_name':name}
+    connect_args = {}
+
+    if backend == 'sqlite' and url.database in (None, '', ':memory:'):
+        # in-memory databases live inside a single connection, no pool sizing
+        return options | {'connect_args':{'check_same_thread':False}}
+
+    options |= {
+        'poolclass':TimedAsyncQueuePool if is_async else TimedQueuePool,
+        'pool_size':DB_POOL_SIZE,
+        'max_overflow':DB_MAX_OVERFLOW,
+        'pool_timeout':DB_POOL_TIMEOUT,
+        'pool_recycle':DB_POOL_RECYCLE,
+    }
+    if backend == 'sqlite':
+        connect_args['timeout'] = SQLITE_BUSY_TIMEOUT_MS / 1000
+        connect_args['check_same_thread'] = False
+    elif backend == 'postgresql':
+        if is_async:
+            connect_args['server_settings'] = {'statement_timeout':str(DB_STATEMENT_TIMEOUT_MS)}
+        else:
+            connect_args['options'] = f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}'
+    options['connect_args'] = connect_args
+    return options
+
+def instrument_engine(sync_engine, name:str):
+    if sync_engine.dialect.name == 'sqlite':
+        event.listen(sync_engine, 'connect', apply_sqlite_pragmas)
+
+    @event.listens_for(sync_engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_in_use.inc(engine=name)
+
+    @event.listens_for(sync_engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        pool_in_use.dec(engine=name)
+
+def make_engine(url, name:str='primary'):
+    url = make_url(url)
+    engine = create_engine(url, **engine_options(url, False, name))
+    instrument_engine(engine, name)
+    return engine
+
+def make_async_engine(url, name:str='primary'):
+    url = to_async_url(url)
+    engine = create_async_engine(url, **engine_options(url, True, name))
+    instrument_engine(engine.sync_engine, name)
+    return engine
+
+# the sync engine is kept for schema creation, migrations and scripts;
+# request handlers only ever use the async engine
+engine = make_engine(DATABASE_URL, 'primary_sync')
+async_engine = make_async_engine(DATABASE_URL)
 
 sessionlocal = sessionmaker(autoflush=False, autocommit=False, bind=engine)
+async_sessionlocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine, class_=AsyncSession)
 
 Base = declarative_base()
 
+async def get_db():
+    async with async_sessionlocal() as db:
+        yield db
+
+def get_sessionmaker():
+    # for responses that outlive the request scope (streaming), which must
+    # open and close their own session inside the response body
+    return async_sessionlocal
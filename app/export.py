@@ -0,0 +1,43 @@
+from sqlalchemy import select
+from .models import Posts
+import csv, io, json, os
+
+EXPORT_YIELD_PER = int(os.getenv('EXPORT_YIELD_PER', 1000))
+EXPORT_COLUMNS = [Posts.id, Posts.title, Posts.content, Posts.slug, Posts.is_published, Posts.created_at, Posts.updated_at, Posts.author_id, Posts.like_count, Posts.comment_count]
+MEDIA_TYPES = {'ndjson':'application/x-ndjson', 'csv':'text/csv'}
+
+def export_query(author_id=None, published=None, created_after=None, created_before=None):
+    stmt = select(*EXPORT_COLUMNS).order_by(Posts.id)
+    if author_id is not None:
+        stmt = stmt.where(Posts.author_id == author_id)
+    if published is not None:
+        stmt = stmt.where(Posts.is_published == published)
+    if created_after is not None:
+        stmt = stmt.where(Posts.created_at >= created_after)
+    if created_before is not None:
+        stmt = stmt.where(Posts.created_at < created_before)
+    return stmt.execution_options(yield_per=EXPORT_YIELD_PER)
+
+def as_ndjson(rows):
+    return ''.join(json.dumps(dict(row._mapping), default=str) + '\n' for row in rows)
+
+def as_csv(rows, header:bool=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow([col.key for col in EXPORT_COLUMNS])
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+async def stream_export(sessionmaker, stmt, fmt:str):
+    """Yield ``stmt`` rows encoded as ``fmt``, one chunk per fetched partition.
+
+    Runs on its own session with a server-side cursor (``yield_per``), so only
+    one partition is held in memory however large the export is.
+    """
+    if fmt == 'csv':
+        yield as_csv([], header=True)
+    async with sessionmaker() as db:
+        result = await db.stream(stmt)
+        async for rows in result.partitions():
+            yield as_csv(rows) if fmt == 'csv' else as_ndjson(rows)
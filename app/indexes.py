@@ -0,0 +1,57 @@
+from sqlalchemy import inspect
+from .database import Base
+import logging
+
+logger = logging.getLogger('app.indexes')
+
+# (table, leading columns, query that needs them); foreign keys are added
+# automatically below since cascades and joins filter on them
+QUERY_PATTERNS = [
+    ('posts', ('created_at', 'id'), 'GET /posts/ keyset pagination'),
+    ('posts', ('author_id', 'created_at'), 'GET /users/posts and export by author'),
+    ('posts', ('slug',), 'GET /posts/{slug}'),
+    ('comments', ('post_id', 'created_at'), 'GET /posts/{post_id}/comments'),
+    ('likes', ('post_id', 'id'), 'GET /posts/{post_id}/likers'),
+    ('likes', ('user_id', 'post_id'), 'POST /posts/{post_id}/like'),
+    ('refresh_tokens', ('token_hash',), 'POST /auth/refresh'),
+    ('refresh_tokens', ('family_id',), 'refresh token reuse revocation'),
+]
+
+def foreign_key_patterns(metadata=Base.metadata):
+    for table in metadata.sorted_tables:
+        for fk in table.foreign_keys:
+            yield table.name, (fk.parent.name,), f'foreign key {table.name}.{fk.parent.name} -> {fk.target_fullname}'
+
+def existing_indexes(inspector, table:str):
+    """Column lists of every index the database has on ``table``, PK included."""
+    columns = [index['column_names'] for index in inspector.get_indexes(table)]
+    columns += [constraint['column_names'] for constraint in inspector.get_unique_constraints(table)]
+    primary_key = inspector.get_pk_constraint(table)['constrained_columns']
+    if primary_key:
+        columns.append(primary_key)
+    return [tuple(cols) for cols in columns]
+
+def audit_indexes(bind, patterns=None):
+    """Return ``(table, columns, reason)`` for each pattern no index leads with.
+
+    An index serves a pattern when its leading columns are the pattern's
+    columns, so ``(post_id, created_at)`` also covers a plain ``post_id`` filter.
+    """
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+    patterns = list(patterns or QUERY_PATTERNS) + list(foreign_key_patterns())
+    gaps = []
+    seen = set()
+    for table, columns, reason in patterns:
+        if table not in tables or (table, columns) in seen:
+            continue
+        seen.add((table, columns))
+        if not any(index[:len(columns)] == columns for index in existing_indexes(inspector, table)):
+            gaps.append((table, columns, reason))
+    return gaps
+
+def warn_missing_indexes(bind):
+    gaps = audit_indexes(bind)
+    for table, columns, reason in gaps:
+        logger.warning('no index on %s(%s), needed by %s', table, ', '.join(columns), reason)
+    return gaps
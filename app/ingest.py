@@ -0,0 +1,78 @@
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', 500))
+BULK_MAX_BATCH_SIZE = int(os.getenv('BULK_MAX_BATCH_SIZE', 5000))
+
+async def ndjson_lines(request):
+    """Yield ``(line_number, raw_line)`` for every non-blank line of the body."""
+    buffer = b''
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, line
+    if buffer.strip():
+        yield line_number + 1, buffer
+
+def describe(exc:ValidationError):
+    return '; '.join(f"{'.'.join(map(str, err['loc'])) or 'body'}: {err['msg']}" for err in exc.errors())
+
+async def insert_batch(db, table, batch:list, errors:list, on_insert=None):
+    rows = [row for _, row in batch]
+    try:
+        await db.execute(insert(table), rows)
+        if on_insert:
+            await on_insert(db, len(rows))
+        await db.commit()
+        return len(rows)
+    except DBAPIError:
+        await db.rollback()
+
+    # something in the batch was rejected: replay it row by row behind
+    # savepoints so only the offending lines are dropped, still one commit
+    inserted = 0
+    for line_number, row in batch:
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(table).values(row))
+            inserted += 1
+        except DBAPIError as exc:
+            errors.append({'line':line_number, 'error':str(exc.orig)})
+    if inserted and on_insert:
+        await on_insert(db, inserted)
+    await db.commit()
+    return inserted
+
+async def bulk_insert(db, request, schema, table, to_row, batch_size:int, on_insert=None):
+    """Stream NDJSON ``schema`` objects from the request into ``table``.
+
+    Rows are inserted with one executemany and one transaction per
+    ``batch_size`` lines; ``on_insert(db, count)`` runs inside that transaction.
+    Bad lines are reported with their line number instead of failing the
+    request. Returns ``{'inserted': n, 'errors': [...]}``.
+    """
+    errors = []
+    inserted = 0
+    batch = []
+    async for line_number, line in ndjson_lines(request):
+        try:
+            item = schema.model_validate_json(line)
+        except ValidationError as exc:
+            errors.append({'line':line_number, 'error':describe(exc)})
+            continue
+        batch.append((line_number, to_row(item)))
+        if len(batch) >= batch_size:
+            inserted += await insert_batch(db, table, batch, errors, on_insert)
+            batch = []
+    if batch:
+        inserted += await insert_batch(db, table, batch, errors, on_insert)
+    errors.sort(key=lambda err: err['line'])
+    return {'inserted':inserted, 'errors':errors}
@@ -0,0 +1,150 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from contextvars import ContextVar
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from . import metrics
+import os, random, tempfile, time, uuid
+
+load_dotenv()
+INSTRUMENTATION_ENABLED = os.getenv('INSTRUMENTATION_ENABLED', 'false').lower() == 'true'
+# profiles are written to PROFILE_DIR for requests sending the header, and for
+# a random PROFILE_SAMPLE_RATE share of all requests; off unless enabled
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILE_HEADER = os.getenv('PROFILE_HEADER', 'x-profile').lower()
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'blog-profiles'))
+
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+request_seconds = metrics.histogram('http_request_seconds', 'Request latency by route, method and status')
+request_statements = metrics.histogram('http_request_sql_statements', 'SQL statements executed per request', buckets=COUNT_BUCKETS)
+request_sql_seconds = metrics.histogram('http_request_sql_seconds', 'Time spent in SQL statements per request')
+render_seconds = metrics.histogram('http_response_render_seconds', 'Time spent encoding JSON response bodies')
+statement_seconds = metrics.histogram('db_statement_seconds', 'Latency of individual SQL statements')
+
+
+@dataclass
+class RequestStats:
+    sql_count:int = 0
+    sql_seconds:float = 0.0
+    render_seconds:float = 0.0
+
+current_stats:ContextVar[RequestStats | None] = ContextVar('current_stats', default=None)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    statement_seconds.observe(elapsed)
+    stats = current_stats.get()
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_seconds += elapsed
+
+def install_sql_events():
+    # listening on the Engine class covers every engine, including the sync
+    # engine under each AsyncEngine
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+
+
+def record_render(elapsed:float):
+    """Account ``elapsed`` seconds of response encoding to the metrics and request."""
+    render_seconds.observe(elapsed)
+    stats = current_stats.get()
+    if stats is not None:
+        stats.render_seconds += elapsed
+
+
+class Profile:
+    """pyinstrument when it is installed, cProfile otherwise."""
+
+    def __init__(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        try:
+            from pyinstrument import Profiler
+            self.profiler = Profiler(async_mode='enabled')
+            self.suffix = 'html'
+        except ImportError:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.suffix = 'prof'
+        self.name = f'{time.strftime("%Y%m%dT%H%M%S")}-{uuid.uuid4().hex[:8]}.{self.suffix}'
+
+    def start(self):
+        if self.suffix == 'html':
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+
+    def stop(self):
+        path = os.path.join(PROFILE_DIR, self.name)
+        if self.suffix == 'html':
+            self.profiler.stop()
+            with open(path, 'w') as output:
+                output.write(self.profiler.output_html())
+        else:
+            self.profiler.disable()
+            self.profiler.dump_stats(path)
+
+
+def wants_profile(scope):
+    if not PROFILING_ENABLED:
+        return False
+    headers = dict(scope.get('headers') or [])
+    return PROFILE_HEADER.encode() in headers or random.random() < PROFILE_SAMPLE_RATE
+
+def route_name(scope):
+    route = scope.get('route')
+    return getattr(route, 'path', None) or 'unmatched'
+
+
+class InstrumentationMiddleware:
+    """Per-request latency, SQL count/time and render time, plus opt-in profiles.
+
+    Totals go to ``app.metrics``; each response also carries a ``Server-Timing``
+    header with the same numbers for that request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        install_sql_events()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] == '/metrics':
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        profile = Profile() if wants_profile(scope) else None
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                total_ms = (time.perf_counter() - started) * 1000
+                timing = f'db;dur={stats.sql_seconds * 1000:.2f};desc="{stats.sql_count} queries", render;dur={stats.render_seconds * 1000:.2f}, app;dur={total_ms:.2f}'
+                headers = list(message.get('headers', [])) + [(b'server-timing', timing.encode())]
+                if profile is not None:
+                    headers.append((b'x-profile-id', profile.name.encode()))
+                message = {**message, 'headers':headers}
+            await send(message)
+
+        if profile is not None:
+            profile.start()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if profile is not None:
+                profile.stop()
+            route = route_name(scope)
+            request_seconds.observe(time.perf_counter() - started, route=route, method=scope['method'], status=status_code)
+            request_statements.observe(stats.sql_count, route=route)
+            request_sql_seconds.observe(stats.sql_seconds, route=route)
+            current_stats.reset(token)
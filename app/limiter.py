@@ -1,5 +1,92 @@
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from limits.storage import Storage
+from jose import JWTError
+from dotenv import load_dotenv
+from .tokens import decode_token
+import os, sqlite3, threading, time
 
-limiter = Limiter(key_func=get_remote_address)
+load_dotenv()
+# memory:// counts per worker process; sqlite:///path/limits.db shares one
+# counter table between workers on a host (put it on /dev/shm to keep it in
+# RAM); redis:// or memcached:// share counters across a cluster
+RATE_LIMIT_STORAGE_URI = os.getenv('RATE_LIMIT_STORAGE_URI', 'memory://')
+# load tests turn limiting off so the per-route budgets do not cap throughput
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
 
+
+class SQLiteStorage(Storage):
+    """Fixed-window counters in a SQLite file, safe across processes."""
+
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri:str, wrap_exceptions:bool=False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        # same convention as SQLAlchemy: sqlite:///relative.db, sqlite:////abs.db
+        self.path = uri.partition(':///')[2] or ':memory:'
+        self.local = threading.local()
+        self.connection.execute('CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL)')
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            self.local.connection = connection
+        return connection
+
+    def incr(self, key, expiry, amount=1, **kwargs):
+        now = time.time()
+        # one statement, so concurrent workers never lose an increment and an
+        # expired window restarts atomically
+        return self.connection.execute(
+            """INSERT INTO rate_limits (key, count, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                count = CASE WHEN expires_at <= ? THEN excluded.count ELSE count + excluded.count END,
+                expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END
+            RETURNING count""",
+            (key, amount, now + expiry, now, now),
+        ).fetchone()[0]
+
+    def get(self, key):
+        row = self.connection.execute('SELECT count FROM rate_limits WHERE key = ? AND expires_at > ?', (key, time.time())).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        row = self.connection.execute('SELECT expires_at FROM rate_limits WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self):
+        try:
+            self.connection.execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        return self.connection.execute('DELETE FROM rate_limits').rowcount
+
+    def clear(self, key):
+        self.connection.execute('DELETE FROM rate_limits WHERE key = ?', (key,))
+
+
+def rate_limit_key(request):
+    # count per user when the caller is authenticated, so clients behind one
+    # NAT do not share a budget; anonymous calls still count per address
+    scheme, _, token = request.headers.get('authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token:
+        try:
+            user_id = decode_token(token).get('id')
+        except JWTError:
+            user_id = None
+        if user_id is not None:
+            return f'user:{user_id}'
+    return get_remote_address(request)
+
+limiter = Limiter(key_func=rate_limit_key, storage_uri=RATE_LIMIT_STORAGE_URI, enabled=RATE_LIMIT_ENABLED)
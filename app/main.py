@@ -1,24 +1,42 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 from .limiter import limiter
 from .database import engine
 from .models import Base
-from .router import blog, auth, user
+from .router import blog, auth, user, admin
+from .instrumentation import InstrumentationMiddleware, INSTRUMENTATION_ENABLED
+from .serialization import TimedJSONResponse
+from .indexes import warn_missing_indexes
+from .replicas import ReadYourWritesMiddleware, DATABASE_REPLICA_URLS
+from . import metrics, querylog
 
-app = FastAPI()
+app = FastAPI(default_response_class=TimedJSONResponse) if INSTRUMENTATION_ENABLED else FastAPI()
 
 Base.metadata.create_all(bind=engine)
+warn_missing_indexes(engine)
 
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 app.add_middleware(SlowAPIMiddleware)
+if INSTRUMENTATION_ENABLED:
+    app.add_middleware(InstrumentationMiddleware)
+if DATABASE_REPLICA_URLS:
+    app.add_middleware(ReadYourWritesMiddleware)
+if querylog.QUERY_LOG_ENABLED:
+    querylog.install()
 
 @app.get('/')
 async def test():
     return {'status':'healthy'}
 
+@app.get('/metrics', response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
 app.include_router(blog.router)
 app.include_router(auth.router)
 app.include_router(user.router)
+app.include_router(admin.router)
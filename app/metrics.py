@@ -0,0 +1,123 @@
+from threading import Lock
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+registry = {}
+_registry_lock = Lock()
+
+def label_key(labels:dict):
+    return tuple(sorted(labels.items()))
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name:str, description:str):
+        self.name = name
+        self.description = description
+        self.lock = Lock()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name, description):
+        super().__init__(name, description)
+        self.values = {}
+
+    def inc(self, amount:float=1, **labels):
+        key = label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(label_key(labels), 0)
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount:float=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value:float, **labels):
+        with self.lock:
+            self.values[label_key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observe(self, value:float, **labels):
+        key = label_key(labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {'buckets':[0] * len(self.buckets), 'sum':0.0, 'count':0}
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def snapshot(self, **labels):
+        series = self.series.get(label_key(labels))
+        if series is None:
+            return {'buckets':[0] * len(self.buckets), 'sum':0.0, 'count':0}
+        with self.lock:
+            return {'buckets':list(series['buckets']), 'sum':series['sum'], 'count':series['count']}
+
+
+def _get_or_create(cls, name, description, **kwargs):
+    with _registry_lock:
+        metric = registry.get(name)
+        if metric is None:
+            metric = registry[name] = cls(name, description, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f'metric {name} already registered as {metric.kind}')
+        return metric
+
+def counter(name:str, description:str) -> Counter:
+    return _get_or_create(Counter, name, description)
+
+def gauge(name:str, description:str) -> Gauge:
+    return _get_or_create(Gauge, name, description)
+
+def histogram(name:str, description:str, buckets=DEFAULT_BUCKETS) -> Histogram:
+    return _get_or_create(Histogram, name, description, buckets=buckets)
+
+def _labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = [(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for name, value in pairs]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+def render():
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    with _registry_lock:
+        metrics = sorted(registry.values(), key=lambda metric: metric.name)
+    for metric in metrics:
+        lines.append(f'# HELP {metric.name} {metric.description}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        with metric.lock:
+            if isinstance(metric, Histogram):
+                for key, series in sorted(metric.series.items()):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, series['buckets']):
+                        cumulative += count
+                        lines.append(f'{metric.name}_bucket{_labels(key, [("le", bound)])} {cumulative}')
+                    lines.append(f'{metric.name}_bucket{_labels(key, [("le", "+Inf")])} {series["count"]}')
+                    lines.append(f'{metric.name}_sum{_labels(key)} {series["sum"]}')
+                    lines.append(f'{metric.name}_count{_labels(key)} {series["count"]}')
+            else:
+                for key, value in sorted(metric.values.items()):
+                    lines.append(f'{metric.name}{_labels(key)} {value}')
+    return '\n'.join(lines) + '\n'
@@ -1,8 +1,12 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, UniqueConstraint
+from sqlalchemy import DDL, event, Column, Integer, String, DateTime, Boolean, ForeignKey, UniqueConstraint, Index
 from sqlalchemy_utils import EmailType
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
+from datetime import datetime, timezone
+
+def utcnow():
+    return datetime.now(timezone.utc)
 
 class Users(Base):
     __tablename__ = 'users'
@@ -16,6 +20,7 @@ class Users(Base):
     posts = relationship('Posts', back_populates='author', cascade='all, delete-orphan')
     comments = relationship('Comments', back_populates='user', cascade='all, delete-orphan') 
     likes = relationship('Likes', back_populates='user', cascade='all, delete-orphan')
+    refresh_tokens = relationship('RefreshTokens', back_populates='user', cascade='all, delete-orphan')
  
 class Posts(Base):
     __tablename__ = 'posts'
@@ -25,26 +30,42 @@ class Posts(Base):
     content = Column(String)
     slug = Column(String, unique=True)
     is_published = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # set client side as well so every row stores the same timestamp format,
+    # which keeps (created_at, id) cursor comparisons exact on SQLite
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
+    # client side for microsecond resolution: the post ETag is built from it
+    updated_at = Column(DateTime(timezone=True), onupdate=utcnow)
     author_id = Column(Integer, ForeignKey('users.id'))
+    like_count = Column(Integer, nullable=False, default=0, server_default='0')
+    comment_count = Column(Integer, nullable=False, default=0, server_default='0')
 
     author = relationship('Users', back_populates='posts')
     comments = relationship('Comments', back_populates='post', cascade='all, delete-orphan')
     likes = relationship('Likes', back_populates='post', cascade='all, delete-orphan')
 
+    __table_args__ = (
+        Index('ix_posts_created_at_id', 'created_at', 'id'),
+        Index('ix_posts_author_id_created_at', 'author_id', 'created_at'),
+    )
+
 class Comments(Base):
     __tablename__ = 'comments'
 
     id = Column(Integer, primary_key=True)
     content = Column(String)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # client side too, for the same (created_at, id) cursor reason as Posts
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
     user_id = Column(Integer, ForeignKey('users.id'))
     post_id = Column(Integer, ForeignKey('posts.id'))
 
     user = relationship('Users', back_populates='comments')
     post = relationship('Posts', back_populates='comments')
 
+    __table_args__ = (
+        Index('ix_comments_post_id_created_at', 'post_id', 'created_at'),
+        Index('ix_comments_user_id', 'user_id'),
+    )
+
 class Likes(Base):
     __tablename__='likes'
 
@@ -55,4 +76,39 @@ class Likes(Base):
     post = relationship('Posts', back_populates='likes')
     user = relationship('Users', back_populates='likes')
 
-    __table_args__ = (UniqueConstraint('user_id', 'post_id', name='unique_user_post_like'),)
+    # the unique constraint covers lookups by user; likers pages seek (post_id, id)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'post_id', name='unique_user_post_like'),
+        Index('ix_likes_post_id_id', 'post_id', 'id'),
+    )
+
+class RefreshTokens(Base):
+    __tablename__ = 'refresh_tokens'
+
+    id = Column(Integer, primary_key=True)
+    # only the SHA-256 of the opaque token is stored
+    token_hash = Column(String(64), unique=True, nullable=False)
+    # every rotation of one login shares a family, so reuse revokes them all
+    family_id = Column(String(32), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    used_at = Column(DateTime(timezone=True))
+    revoked_at = Column(DateTime(timezone=True))
+
+    user = relationship('Users', back_populates='refresh_tokens')
+
+
+# SQLite keeps timestamps as text and (created_at, id) cursors compare that
+# text. CURRENT_TIMESTAMP, used by the server default and by raw SQL inserts,
+# has no fractional part, so such rows are padded to the format SQLAlchemy
+# binds, or a cursor taken from one would never move past it
+SQLITE_TIMESTAMP_DDL = [
+    f"""CREATE TRIGGER IF NOT EXISTS {table}_created_at_format AFTER INSERT ON {table}
+    WHEN length(new.created_at) = 19 BEGIN
+        UPDATE {table} SET created_at = new.created_at || '.000000' WHERE id = new.id;
+    END"""
+    for table in ('posts', 'comments')
+]
+
+for model, statement in zip((Posts, Comments), SQLITE_TIMESTAMP_DDL):
+    event.listen(model.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
@@ -0,0 +1,67 @@
+from fastapi import HTTPException
+from starlette import status
+from sqlalchemy import tuple_, Row
+from datetime import datetime
+import base64, json
+
+def encode_cursor(direction:str, values:list):
+    raw = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    data = json.dumps({'d':direction, 'k':raw}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+def coerce_key(col, value):
+    # cursors come from clients, so only a scalar of the column's own type
+    # may reach the driver
+    python_type = col.type.python_type
+    if python_type is datetime and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if type(value) is python_type or (python_type is float and type(value) is int):
+        return value
+    raise ValueError(value)
+
+def decode_cursor(cursor:str, columns:list):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        direction, raw = data['d'], data['k']
+        if direction not in ('next', 'prev') or len(raw) != len(columns):
+            raise ValueError(cursor)
+        values = [coerce_key(col, v) for col, v in zip(columns, raw)]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='invalid cursor')
+    return direction, values
+
+async def keyset_page(db, stmt, columns:list, limit:int, cursor:str | None=None, scalars:bool=True, newest_first:bool=True):
+    """Keyset pagination over ``columns``, newest first unless ``newest_first=False``.
+
+    Each page is a single index range scan seeking past the cursor key, so
+    page N costs the same as page 1. Returns ``(rows, next_cursor, prev_cursor)``;
+    with ``scalars=False`` the rows are ``Row`` tuples instead of entities.
+    """
+    direction, key = decode_cursor(cursor, columns) if cursor else ('next', None)
+    # a prev cursor scans against the listing order and is flipped afterwards
+    descending = (direction == 'next') == newest_first
+    if key is not None:
+        stmt = stmt.where(tuple_(*columns) < tuple(key) if descending else tuple_(*columns) > tuple(key))
+    stmt = stmt.order_by(*[col.desc() if descending else col.asc() for col in columns])
+
+    result = await db.execute(stmt.limit(limit + 1))
+    rows = list(result.scalars().all() if scalars else result.all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == 'prev':
+        rows.reverse()
+    if not rows:
+        return rows, None, None
+
+    def key_of(row):
+        if isinstance(row, Row):
+            return [row._mapping[col] for col in columns]
+        return [getattr(row, col.key) for col in columns]
+
+    if direction == 'next':
+        next_cursor = encode_cursor('next', key_of(rows[-1])) if has_more else None
+        prev_cursor = encode_cursor('prev', key_of(rows[0])) if key is not None else None
+    else:
+        next_cursor = encode_cursor('next', key_of(rows[-1]))
+        prev_cursor = encode_cursor('prev', key_of(rows[0])) if has_more else None
+    return rows, next_cursor, prev_cursor
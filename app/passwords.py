@@ -0,0 +1,97 @@
+from fastapi import HTTPException
+from starlette import status
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+from dotenv import load_dotenv
+from . import metrics
+import asyncio, math, os, time
+
+load_dotenv()
+# bcrypt releases the GIL while hashing, so a thread pool gives real
+# parallelism; keep it below the core count so logins cannot starve reads
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv('PASSWORD_HASH_MAX_QUEUE', 32))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv('PASSWORD_HASH_RETRY_AFTER', 1))
+# 'bcrypt' or 'argon2' (needs argon2-cffi); hashes in the other scheme still
+# verify and are rehashed on the next successful login
+PASSWORD_SCHEME = os.getenv('PASSWORD_SCHEME', 'bcrypt')
+PASSWORD_HASH_TARGET_MS = float(os.getenv('PASSWORD_HASH_TARGET_MS', 250))
+# pin the bcrypt cost instead of calibrating it at startup
+PASSWORD_BCRYPT_ROUNDS = os.getenv('PASSWORD_BCRYPT_ROUNDS')
+BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS = 10, 16
+PASSWORD_ARGON2_MEMORY_KIB = int(os.getenv('PASSWORD_ARGON2_MEMORY_KIB', 64 * 1024))
+PASSWORD_ARGON2_TIME_COST = int(os.getenv('PASSWORD_ARGON2_TIME_COST', 3))
+
+executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+capacity = PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE
+pending = 0
+
+hash_seconds = metrics.histogram('password_hash_seconds', 'Time spent hashing or verifying a password on a worker')
+queue_wait_seconds = metrics.histogram('password_hash_queue_wait_seconds', 'Time a hashing call waited for a free worker')
+in_flight = metrics.gauge('password_hash_in_flight', 'Hashing calls running or queued')
+rejected = metrics.counter('password_hash_rejected_total', 'Hashing calls refused because the pool was saturated')
+
+def calibrate_bcrypt_rounds(target_seconds:float, probe_rounds:int=8):
+    """Highest bcrypt cost whose hash time stays within ``target_seconds``.
+
+    Each extra round doubles the work, so one cheap probe hash is enough to
+    extrapolate. Never goes below ``BCRYPT_MIN_ROUNDS``.
+    """
+    if target_seconds <= 0:
+        return BCRYPT_MIN_ROUNDS
+    probe = CryptContext(schemes=['bcrypt'], bcrypt__rounds=probe_rounds)
+    started = time.perf_counter()
+    probe.hash('calibration-probe')
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    rounds = probe_rounds + math.floor(math.log2(target_seconds / elapsed))
+    return min(max(rounds, BCRYPT_MIN_ROUNDS), BCRYPT_MAX_ROUNDS)
+
+def build_context(scheme:str=PASSWORD_SCHEME):
+    rounds = int(PASSWORD_BCRYPT_ROUNDS) if PASSWORD_BCRYPT_ROUNDS else calibrate_bcrypt_rounds(PASSWORD_HASH_TARGET_MS / 1000)
+    # hashes below the configured cost count as outdated and get rehashed
+    options = {'bcrypt__default_rounds':rounds, 'bcrypt__min_rounds':rounds}
+    if scheme == 'argon2':
+        # each worker thread hashes one password; split the cores between them
+        options |= {
+            'argon2__memory_cost':PASSWORD_ARGON2_MEMORY_KIB,
+            'argon2__time_cost':PASSWORD_ARGON2_TIME_COST,
+            'argon2__parallelism':max(1, (os.cpu_count() or 1) // PASSWORD_HASH_WORKERS),
+        }
+        return CryptContext(schemes=['argon2', 'bcrypt'], deprecated=['bcrypt'], **options)
+    return CryptContext(schemes=['bcrypt'], deprecated='auto', **options)
+
+password_context = build_context()
+
+def _timed(operation, submitted, func, args):
+    started = time.perf_counter()
+    queue_wait_seconds.observe(started - submitted, operation=operation)
+    try:
+        return func(*args)
+    finally:
+        hash_seconds.observe(time.perf_counter() - started, operation=operation)
+
+async def run_hashing(operation:str, func, *args):
+    # the counter is only touched from the event loop thread, so it needs no lock
+    global pending
+    if pending >= capacity:
+        rejected.inc(operation=operation)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='server busy, try again later',
+            headers={'Retry-After':str(PASSWORD_HASH_RETRY_AFTER)}
+        )
+    pending += 1
+    in_flight.inc()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, _timed, operation, time.perf_counter(), func, args)
+    finally:
+        pending -= 1
+        in_flight.dec()
+
+async def hash_password(password:str):
+    return await run_hashing('hash', password_context.hash, password)
+
+async def verify_password(password:str, hashed_password:str):
+    """Return ``(valid, new_hash)``; ``new_hash`` is set when the stored hash is outdated."""
+    return await run_hashing('verify', password_context.verify_and_update, password, hashed_password)
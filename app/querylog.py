@@ -0,0 +1,139 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from collections import deque
+from threading import Lock
+from dotenv import load_dotenv
+import hashlib, logging, os, re, time
+
+load_dotenv()
+QUERY_LOG_ENABLED = os.getenv('QUERY_LOG_ENABLED', 'false').lower() == 'true'
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+QUERY_LOG_EXPLAIN = os.getenv('QUERY_LOG_EXPLAIN', 'true').lower() == 'true'
+QUERY_LOG_MAX_FINGERPRINTS = int(os.getenv('QUERY_LOG_MAX_FINGERPRINTS', 1000))
+QUERY_LOG_SAMPLES = int(os.getenv('QUERY_LOG_SAMPLES', 1000))
+
+logger = logging.getLogger('app.slow_query')
+
+EXPLAIN_PREFIX = {'sqlite':'EXPLAIN QUERY PLAN ', 'postgresql':'EXPLAIN '}
+EXPLAINABLE = ('select', 'insert', 'update', 'delete', 'with')
+
+_string = re.compile(r"'(?:[^']|'')*'")
+_number = re.compile(r'\b\d+(?:\.\d+)?\b')
+_placeholder = re.compile(r'\?|%\(\w+\)s|%s|\$\d+|(?<!:):\w+')
+_in_list = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_space = re.compile(r'\s+')
+
+def fingerprint(statement:str):
+    """Normalize ``statement`` so runs that differ only in values group together."""
+    text = _string.sub('?', statement)
+    text = _placeholder.sub('?', text)
+    text = _number.sub('?', text)
+    text = _in_list.sub('(...)', text)
+    return _space.sub(' ', text).strip()
+
+
+class QueryStats:
+    def __init__(self, statement:str):
+        self.statement = statement
+        self.count = 0
+        self.slow_count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.samples = deque(maxlen=QUERY_LOG_SAMPLES)
+        self.plan = None
+
+    def percentile(self, q:float):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def as_dict(self, key:str):
+        return {
+            'fingerprint':key,
+            'statement':self.statement,
+            'count':self.count,
+            'slow_count':self.slow_count,
+            'total_ms':round(self.total_seconds * 1000, 3),
+            'mean_ms':round(self.total_seconds / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms':round(self.percentile(0.50) * 1000, 3),
+            'p95_ms':round(self.percentile(0.95) * 1000, 3),
+            'p99_ms':round(self.percentile(0.99) * 1000, 3),
+            'max_ms':round(self.max_seconds * 1000, 3),
+            'plan':self.plan,
+        }
+
+
+stats = {}
+stats_lock = Lock()
+
+def explain(conn, statement:str, parameters):
+    prefix = EXPLAIN_PREFIX.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip().lower().startswith(EXPLAINABLE):
+        return None
+    # straight on the DBAPI connection so the EXPLAIN is not itself recorded;
+    # it shares the request's transaction, and a failed statement aborts a
+    # PostgreSQL transaction, so it runs inside a savepoint there
+    guarded = conn.dialect.name == 'postgresql'
+    cursor = conn.connection.cursor()
+    try:
+        if guarded:
+            cursor.execute('SAVEPOINT querylog_explain')
+        try:
+            cursor.execute(prefix + statement, parameters)
+            plan = [' | '.join(str(col) for col in row) for row in cursor.fetchall()]
+        except Exception as exc:
+            if guarded:
+                cursor.execute('ROLLBACK TO SAVEPOINT querylog_explain')
+            plan = [f'explain failed: {exc}']
+        if guarded:
+            cursor.execute('RELEASE SAVEPOINT querylog_explain')
+        return plan
+    finally:
+        cursor.close()
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('querylog_started', []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['querylog_started'].pop()
+    normalized = fingerprint(statement)
+    key = hashlib.sha1(normalized.encode()).hexdigest()[:12]
+    slow = elapsed * 1000 >= SLOW_QUERY_MS
+
+    first_slow = False
+    with stats_lock:
+        entry = stats.get(key)
+        # once the table is full, new fingerprints are still logged when
+        # slow, just not aggregated
+        if entry is None and len(stats) < QUERY_LOG_MAX_FINGERPRINTS:
+            entry = stats[key] = QueryStats(normalized)
+        if entry is not None:
+            entry.count += 1
+            entry.total_seconds += elapsed
+            entry.max_seconds = max(entry.max_seconds, elapsed)
+            entry.samples.append(elapsed)
+            first_slow = slow and entry.slow_count == 0
+            if slow:
+                entry.slow_count += 1
+
+    if not slow:
+        return
+    logger.warning('slow query %s took %.1fms: %s', key, elapsed * 1000, normalized)
+    if first_slow and QUERY_LOG_EXPLAIN and not executemany:
+        entry.plan = explain(conn, statement, parameters)
+
+def install():
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+
+def report(sort:str='total_ms', limit:int=50):
+    with stats_lock:
+        rows = [entry.as_dict(key) for key, entry in stats.items()]
+    rows.sort(key=lambda row: row[sort], reverse=True)
+    return rows[:limit]
+
+def reset():
+    with stats_lock:
+        stats.clear()
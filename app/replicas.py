@@ -0,0 +1,131 @@
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, InterfaceError
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+from dotenv import load_dotenv
+from .database import make_async_engine, async_sessionlocal
+from . import metrics
+import itertools, math, os, time
+
+load_dotenv()
+# comma separated; empty keeps every read on the primary. For local testing
+# two SQLite files work (a copy of the primary), or two local Postgres URLs
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+# after a write, that client's reads stay on the primary this long, so they
+# see their own writes despite replication lag; the deadline travels in a
+# cookie, so it holds whichever worker serves the next request
+REPLICA_STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', 5))
+REPLICA_STICKY_COOKIE = os.getenv('REPLICA_STICKY_COOKIE', 'read_primary_until')
+# a healthy replica is probed again after this long, a failed one is
+# skipped for REPLICA_RETRY_AFTER before the next probe
+REPLICA_HEALTH_INTERVAL = float(os.getenv('REPLICA_HEALTH_INTERVAL', 10))
+REPLICA_RETRY_AFTER = float(os.getenv('REPLICA_RETRY_AFTER', 30))
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+routed_reads = metrics.counter('db_routed_reads_total', 'Read-only sessions by the engine serving them')
+replica_failures = metrics.counter('db_replica_failures_total', 'Failed replica health checks and reads')
+
+
+class Replica:
+    def __init__(self, name:str, engine):
+        self.name = name
+        self.engine = engine
+        self.sessionmaker = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=engine, class_=AsyncSession)
+        self.checked_at = 0.0
+        self.down_until = 0.0
+
+    def mark_down(self):
+        self.down_until = time.monotonic() + REPLICA_RETRY_AFTER
+        replica_failures.inc(replica=self.name)
+
+    async def healthy(self):
+        now = time.monotonic()
+        if now < self.down_until:
+            return False
+        if now - self.checked_at < REPLICA_HEALTH_INTERVAL:
+            return True
+        try:
+            async with self.engine.connect() as conn:
+                await conn.execute(text('SELECT 1'))
+        except (OperationalError, InterfaceError, OSError):
+            self.mark_down()
+            return False
+        self.checked_at = now
+        return True
+
+
+class ReplicaSet:
+    def __init__(self, replicas:list[Replica]):
+        self.replicas = replicas
+        self.turn = itertools.count()
+
+    async def pick(self):
+        """The next healthy replica in round-robin order, or None when all are down."""
+        start = next(self.turn)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if await replica.healthy():
+                return replica
+        return None
+
+replicas = ReplicaSet([Replica(f'replica{i}', make_async_engine(url, f'replica{i}')) for i, url in enumerate(DATABASE_REPLICA_URLS, 1)])
+
+
+def sticky_cookie():
+    until = time.time() + REPLICA_STICKY_SECONDS
+    return f'{REPLICA_STICKY_COOKIE}={until:.3f}; Max-Age={math.ceil(REPLICA_STICKY_SECONDS)}; Path=/; HttpOnly; SameSite=Lax'
+
+def is_sticky(request:Request):
+    # a forged value only sends that client's own reads to the primary
+    try:
+        return float(request.cookies.get(REPLICA_STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+async def route_read(request:Request):
+    """The replica to serve this read from, or None for the primary."""
+    if not replicas.replicas or is_sticky(request):
+        replica = None
+    else:
+        replica = await replicas.pick()
+    routed_reads.inc(engine=replica.name if replica else 'primary')
+    return replica
+
+def replica_lag(db:AsyncSession):
+    """How many seconds ``db``'s reads may trail the primary, for ``cached(lag=)``.
+
+    A replica is assumed to catch up within the sticky window; the primary
+    never lags.
+    """
+    return REPLICA_STICKY_SECONDS if db.info.get('replica') is not None else 0
+
+async def get_read_db(request:Request):
+    replica = await route_read(request)
+    async with (replica.sessionmaker if replica else async_sessionlocal)() as db:
+        db.info['replica'] = replica.name if replica else None
+        try:
+            yield db
+        except (OperationalError, InterfaceError):
+            if replica is not None:
+                replica.mark_down()
+            raise
+
+
+class ReadYourWritesMiddleware:
+    """Pins a client's reads to the primary for a while after each write."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] in SAFE_METHODS:
+            return await self.app(scope, receive, send)
+
+        async def send_and_stick(message):
+            if message['type'] == 'http.response.start' and message['status'] < 400:
+                headers = list(message.get('headers', [])) + [(b'set-cookie', sticky_cookie().encode())]
+                message = {**message, 'headers':headers}
+            await send(message)
+
+        await self.app(scope, receive, send_and_stick)
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, HTTPException, Request, Depends, Query
+from starlette import status
+from typing import Annotated, Literal
+from dotenv import load_dotenv
+from ..limiter import limiter
+from .. import querylog
+from .auth import get_current_user
+import os
+
+router = APIRouter(
+    prefix='/admin',
+    tags=['admin']
+)
+
+load_dotenv()
+ADMIN_USER_IDS = {int(part) for part in os.getenv('ADMIN_USER_IDS', '').split(',') if part.strip()}
+
+def get_admin_user(user:Annotated[dict, Depends(get_current_user)]):
+    if not user or user.get('id') not in ADMIN_USER_IDS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Forbidden')
+    return user
+
+admin_dependency = Annotated[dict, Depends(get_admin_user)]
+
+@router.get('/queries', status_code=status.HTTP_200_OK)
+@limiter.limit('30/minute')
+async def query_stats(admin:admin_dependency, request:Request, sort:Literal['total_ms', 'count', 'slow_count', 'p95_ms', 'p99_ms', 'max_ms']='total_ms', limit:int=Query(50, ge=1, le=1000), slow_only:bool=False):
+    rows = querylog.report(sort, querylog.QUERY_LOG_MAX_FINGERPRINTS)
+    if slow_only:
+        rows = [row for row in rows if row['slow_count']]
+    return {'enabled':querylog.QUERY_LOG_ENABLED, 'slow_query_ms':querylog.SLOW_QUERY_MS, 'item':rows[:limit]}
+
+@router.delete('/queries', status_code=status.HTTP_204_NO_CONTENT)
+@limiter.limit('30/minute')
+async def reset_query_stats(admin:admin_dependency, request:Request):
+    querylog.reset()
@@ -2,16 +2,18 @@ from fastapi import APIRouter, HTTPException, Request, Depends
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from starlette import status
 from pydantic import BaseModel, Field, EmailStr
-from passlib.context import CryptContext
 from typing import Annotated
-from sqlalchemy.orm import Session
-from ..database import sessionlocal
-from ..models import Users
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_db
+from ..models import Users, RefreshTokens
 from ..limiter import limiter
-from jose import jwt, JWTError
+from ..passwords import verify_password
+from ..tokens import encode_token, decode_token, SECRET_KEY, ALGORITHM
+from jose import JWTError
 from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
-import os
+import hashlib, os, secrets
 
 router = APIRouter(
     prefix='/auth',
@@ -19,18 +21,10 @@ router = APIRouter(
 )
 
 load_dotenv()
-SECRET_KEY = os.getenv('SECRET_KEY')
-ALGORITHM = 'HS256'
-bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+ACCESS_TOKEN_MINUTES = int(os.getenv('ACCESS_TOKEN_MINUTES', 30))
+REFRESH_TOKEN_DAYS = int(os.getenv('REFRESH_TOKEN_DAYS', 30))
 
-def get_db():
-    db = sessionlocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
 outh2_bearer = OAuth2PasswordBearer(tokenUrl='/auth/token')
 
 class UserLogin(BaseModel):
@@ -40,25 +34,86 @@ class UserLogin(BaseModel):
 class Token(BaseModel):
     access_token:str
     token_type:str
+    refresh_token:str | None = None
 
-def authenticate_user(email:EmailStr, password:str, db:Session):
-    user = db.query(Users).filter(Users.email == email).first()
+class RefreshRequest(BaseModel):
+    refresh_token:str
+
+async def authenticate_user(email:EmailStr, password:str, db:AsyncSession):
+    user = await db.scalar(select(Users).where(Users.email == email))
     if not user:
         return False
-    if not bcrypt_context.verify(password, user.hashed_password):
+    valid, new_hash = await verify_password(password, user.hashed_password)
+    if not valid:
         return False
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 def create_access_token(email:EmailStr, id:int, expires:timedelta):
     encode = {'sub':email, 'id':id}
     expire = datetime.now(timezone.utc) + expires
     encode.update({'exp':expire})
-    token = jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
+    token = encode_token(encode)
     return token
 
+def hash_refresh_token(token:str):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+async def issue_refresh_token(db:AsyncSession, user_id:int, family_id:str | None=None):
+    """Store a new opaque refresh token and return it; the caller commits."""
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshTokens(
+        token_hash=hash_refresh_token(token),
+        family_id=family_id or secrets.token_hex(16),
+        user_id=user_id,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_DAYS),
+    ))
+    return token
+
+async def revoke_family(db:AsyncSession, family_id:str):
+    await db.execute(
+        update(RefreshTokens)
+        .where(RefreshTokens.family_id == family_id, RefreshTokens.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+    await db.commit()
+
+async def rotate_refresh_token(db:AsyncSession, token:str):
+    """Spend ``token`` and return ``(user, new_refresh_token)``.
+
+    The token is marked used in one conditional UPDATE, so two concurrent
+    refreshes cannot both win. Presenting a token that was already used means
+    it leaked: the whole family is revoked and the caller gets 401.
+    """
+    now = datetime.now(timezone.utc)
+    token_hash = hash_refresh_token(token)
+    spent = (await db.execute(
+        update(RefreshTokens)
+        .where(
+            RefreshTokens.token_hash == token_hash,
+            RefreshTokens.used_at.is_(None),
+            RefreshTokens.revoked_at.is_(None),
+            RefreshTokens.expires_at > now,
+        )
+        .values(used_at=now)
+        .returning(RefreshTokens.user_id, RefreshTokens.family_id)
+    )).first()
+    if spent is None:
+        stored = await db.scalar(select(RefreshTokens).where(RefreshTokens.token_hash == token_hash))
+        if stored is not None and stored.used_at is not None:
+            await revoke_family(db, stored.family_id)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='invalid refresh token')
+
+    user = await db.scalar(select(Users).where(Users.id == spent.user_id))
+    new_token = await issue_refresh_token(db, spent.user_id, spent.family_id)
+    await db.commit()
+    return user, new_token
+
 async def get_current_user(token:Annotated[str, Depends(outh2_bearer)]):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         email:EmailStr = payload.get('sub')
         id:int = payload.get('id')
         if email is None or id is None:
@@ -70,12 +125,28 @@ async def get_current_user(token:Annotated[str, Depends(outh2_bearer)]):
 @router.post('/token', response_model=Token)
 @limiter.limit('30/minute')
 async def login_access(db:db_dependency, request:Request, form:Annotated[OAuth2PasswordRequestForm, Depends()]):
-    user = authenticate_user(form.username, form.password, db)
+    user = await authenticate_user(form.username, form.password, db)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='invalid credentials')
     
-    token = create_access_token(user.email, user.id, timedelta(minutes=30))
-    return {'access_token':token, 'token_type':'bearer'}
+    token = create_access_token(user.email, user.id, timedelta(minutes=ACCESS_TOKEN_MINUTES))
+    refresh_token = await issue_refresh_token(db, user.id)
+    await db.commit()
+    return {'access_token':token, 'token_type':'bearer', 'refresh_token':refresh_token}
+
+@router.post('/refresh', response_model=Token)
+@limiter.limit('60/minute')
+async def refresh_access(db:db_dependency, request:Request, body:RefreshRequest):
+    user, refresh_token = await rotate_refresh_token(db, body.refresh_token)
+    token = create_access_token(user.email, user.id, timedelta(minutes=ACCESS_TOKEN_MINUTES))
+    return {'access_token':token, 'token_type':'bearer', 'refresh_token':refresh_token}
+
+@router.post('/revoke', status_code=status.HTTP_204_NO_CONTENT)
+@limiter.limit('30/minute')
+async def revoke_refresh(db:db_dependency, request:Request, body:RefreshRequest):
+    family_id = await db.scalar(select(RefreshTokens.family_id).where(RefreshTokens.token_hash == hash_refresh_token(body.refresh_token)))
+    if family_id is not None:
+        await revoke_family(db, family_id)
 
 
 
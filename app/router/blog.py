@@ -1,42 +1,77 @@
 from fastapi import APIRouter, HTTPException, Request, Depends, Path, Query
+from fastapi.responses import StreamingResponse
 from starlette import status
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Annotated, Generic, TypeVar, Optional
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter
+from typing import Annotated, Generic, TypeVar, Optional, ClassVar, Literal
+from datetime import datetime
 from dataclasses import dataclass
-from sqlalchemy.orm import Session
-from sqlalchemy import event, select, or_, func
-from ..database import sessionlocal
-from ..models import Posts, Comments, Likes
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import event, select, update, insert, delete, exists, literal, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.exc import IntegrityError
+from ..database import get_db, get_sessionmaker
+from ..models import Posts, Comments, Likes, Users
 from .auth import get_current_user
 from ..limiter import limiter
-import string, random, uuid, re
+from ..pagination import keyset_page
+from ..search import get_search_backend
+from ..export import export_query, stream_export, MEDIA_TYPES
+from ..conditional import post_validators, comment_validators, is_conditional, not_modified, not_modified_response, validator_headers
+from ..cache import cached, invalidate, post_keys, generation as cache_generation
+from ..replicas import get_read_db, replica_lag
+from ..ingest import bulk_insert, BULK_BATCH_SIZE, BULK_MAX_BATCH_SIZE
+from ..serialization import json_response, json_body
+import string, secrets, threading, time, re
 
 router = APIRouter(
     prefix='/posts',
     tags=['posts']
 )
 
-def get_db():
-    db = sessionlocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-def generate_slug(db:Session, title:str, max_limit=10):
-    for _ in range(max_limit):
-        slug = re.sub(r'[^a-zA-Z0-9]+', '-', title.lower()).strip('-')
-        slug = f"{slug}-{uuid.uuid4().hex[:6]}"
-        exists = db.query(Posts).filter(Posts.slug == slug).first()
-        if not exists:
-            return slug
+BASE62 = string.digits + string.ascii_letters
+slug_lock = threading.Lock()
+last_slug_id = 0
+
+def base62(number:int):
+    digits = []
+    while number:
+        number, rem = divmod(number, 62)
+        digits.append(BASE62[rem])
+    return ''.join(reversed(digits)) or '0'
+
+def next_slug_id():
+    # ULID-style: 48-bit millisecond timestamp over 32 random bits, bumped by
+    # one whenever the clock has not moved so ids stay unique in this process
+    global last_slug_id
+    with slug_lock:
+        slug_id = (time.time_ns() // 1_000_000) << 32 | secrets.randbits(32)
+        last_slug_id = max(slug_id, last_slug_id + 1)
+        return last_slug_id
+
+def generate_slug(title:str):
+    slug = re.sub(r'[^a-zA-Z0-9]+', '-', title.lower()).strip('-')
+    return f"{slug}-{base62(next_slug_id())}".lstrip('-')
 
 @event.listens_for(Posts, "before_insert")
 def set_slug(mapper, connection, target):
+    # no lookups here: the suffix is unique by construction and the unique
+    # index on posts.slug is the backstop, so batched flushes stay batched
     if not target.slug:
-        session = Session(bind=connection)
-        target.slug = generate_slug(db=session, title=target.title)
+        target.slug = generate_slug(target.title or '')
 
+def newest_comment(post_id):
+    # one seek on ix_comments_post_id_created_at, whatever the thread length
+    return (
+        select(Comments.created_at, Comments.id)
+        .where(Comments.post_id == post_id)
+        .order_by(Comments.created_at.desc(), Comments.id.desc())
+        .limit(1)
+    )
+
+# correlated with the outer Posts row, for validators that must move when a
+# comment is added even though the post itself is unchanged
+latest_comment_at = newest_comment(Posts.id).with_only_columns(Comments.created_at).scalar_subquery().label('latest_comment_at')
 
 T = TypeVar('T')
 
@@ -49,12 +84,26 @@ class authorread(BaseModel):
     id:int 
     username:str
 
+    model_config = ConfigDict(from_attributes=True)
+
 class Commentread(BaseModel, Generic[T]):
     id:int
     content:str
     user: T
 
     model_config = ConfigDict(from_attributes=True)
+    # one joined row per comment, author included, in thread order
+    columns:ClassVar[tuple] = (Comments.id, Comments.content, Comments.created_at, Users.id.label('user_id'), Users.username)
+
+    @staticmethod
+    def from_row(row):
+        return {'id':row.id, 'content':row.content, 'user':{'id':row.user_id, 'username':row.username}}
+
+class CommentPage(BaseModel):
+    limit:int
+    item:list[Commentread[authorread]]
+    next_cursor:Optional[str] = None
+    prev_cursor:Optional[str] = None
 
 class PostRead(BaseModel):
     id:int
@@ -62,9 +111,55 @@ class PostRead(BaseModel):
     content:str
     slug:str
     author:authorread
+    # only the first comments of the thread; page on with comments_next_cursor
     comments:list[Commentread[authorread] ]| None = None
+    comments_next_cursor:Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+    # the post and its author as one joined row, plus what the validators need
+    columns:ClassVar[tuple] = (
+        Posts.id, Posts.title, Posts.content, Posts.slug, Posts.created_at, Posts.updated_at, Posts.comment_count,
+        Users.id.label('author_id'), Users.username.label('author_username'), latest_comment_at,
+    )
+
+    @staticmethod
+    def from_row(row, comments, comments_next_cursor):
+        return {
+            'id':row.id, 'title':row.title, 'content':row.content, 'slug':row.slug,
+            'author':{'id':row.author_id, 'username':row.author_username},
+            'comments':comments, 'comments_next_cursor':comments_next_cursor,
+        }
+
+class PostSummary(BaseModel):
+    # every field may be left out of a sparse projection, see Projection
+    id:Optional[int] = None
+    title:Optional[str] = None
+    content:Optional[str] = None
+    slug:Optional[str] = None
+    is_published:Optional[bool] = None
+    created_at:Optional[datetime] = None
+    updated_at:Optional[datetime] = None
+    author_id:Optional[int] = None
+    like_count:Optional[int] = None
+    comment_count:Optional[int] = None
 
     model_config = ConfigDict(from_attributes=True)
+    columns:ClassVar[tuple] = (
+        Posts.id, Posts.title, Posts.content, Posts.slug, Posts.is_published, Posts.created_at,
+        Posts.updated_at, Posts.author_id, Posts.like_count, Posts.comment_count,
+    )
+
+class PostPage(BaseModel):
+    limit:int
+    item:list[PostSummary]
+    next_cursor:Optional[str] = None
+    prev_cursor:Optional[str] = None
+
+# built once at import; each call then runs straight in pydantic-core
+post_read_adapter = TypeAdapter(PostRead)
+post_page_adapter = TypeAdapter(PostPage)
+post_list_adapter = TypeAdapter(list[PostSummary])
+comment_page_adapter = TypeAdapter(CommentPage)
 
 class PostUpdate(BaseModel):
     title:str
@@ -76,29 +171,177 @@ class CommentCreate(BaseModel):
 
 @dataclass
 class Pagination:
-    limit:int=10
-    offset:int=0
+    limit:int=Query(10, ge=1, le=100)
+    # only search results page by offset, every other listing by cursor
+    offset:Optional[int]=Query(None, ge=0)
+    cursor:Optional[str]=None
+
+    def keyset(self):
+        # ignoring an offset would silently hand old clients the first page
+        if self.offset is not None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='offset is only supported with search, page with cursor instead')
+
+@dataclass
+class Projection:
+    fields:Optional[str]=Query(None, description='Comma separated post fields to return, e.g. id,title,slug')
+    excerpt:Optional[int]=Query(None, ge=1, le=10000, description='Truncate content to this many characters')
+
+    def __post_init__(self):
+        self.names = None
+        if self.fields:
+            self.names = {name.strip() for name in self.fields.split(',') if name.strip()}
+            unknown = self.names - PostSummary.model_fields.keys()
+            if unknown:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f'unknown fields: {", ".join(sorted(unknown))}')
+
+    def columns(self, *keys):
+        """Columns to select: the requested fields plus any ``keys`` a cursor needs."""
+        columns = [col for col in PostSummary.columns if self.names is None or col.key in self.names or any(col is key for key in keys)]
+        if self.excerpt:
+            # truncated by the database, so the full body never leaves it
+            columns = [func.substr(Posts.content, 1, self.excerpt).label('content') if col is Posts.content else col for col in columns]
+        return columns
+
+    def include(self, paged:bool=True):
+        """``dump_json`` include for the rows, or for a ``PostPage`` holding them."""
+        if self.names is None:
+            return None
+        include = {'__all__':self.names}
+        return {'item':include, 'limit':True, 'next_cursor':True, 'prev_cursor':True} if paged else include
+
+POST_EMBED_COMMENTS = 10
+
+async def thread_state(db:AsyncSession, post_id:int):
+    """``(comment_count, newest created_at, newest id)`` for a thread in one row.
+
+    The counter is maintained on the post and the newest comment is one seek
+    on ix_comments_post_id_created_at, so this costs the same for any thread
+    length.
+    """
+    newest = newest_comment(post_id)
+    row = (await db.execute(select(
+        Posts.comment_count,
+        newest.with_only_columns(Comments.created_at).scalar_subquery(),
+        newest.with_only_columns(Comments.id).scalar_subquery(),
+    ).where(Posts.id == post_id))).first()
+    return tuple(row) if row else (0, None, None)
+
+async def comment_page(db:AsyncSession, post_id:int, limit:int, cursor:str | None=None):
+    """One page of a post's thread, oldest first, as ``(comments, next_cursor, prev_cursor)``."""
+    stmt = select(*Commentread.columns).join(Users, Users.id == Comments.user_id).where(Comments.post_id == post_id)
+    rows, next_cursor, prev_cursor = await keyset_page(db, stmt, [Comments.created_at, Comments.id], limit, cursor, scalars=False, newest_first=False)
+    return [Commentread.from_row(row) for row in rows], next_cursor, prev_cursor
+
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+# read-only handlers, routed to a replica when any are configured
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
+
+def bump_counter(column, post_id:int, amount:int):
+    # counters are not content edits, so leave updated_at alone
+    return (
+        update(Posts)
+        .where(Posts.id == post_id)
+        .values({column:column + amount, Posts.updated_at:Posts.updated_at})
+    )
+
+upsert_inserts = {'sqlite':sqlite_insert, 'postgresql':postgresql_insert}
+
+def toggle_like_statement(post_id:int, user_id:int):
+    """The whole PostgreSQL toggle as one statement of data-modifying CTEs.
+
+    Deletes the like if there is one, otherwise inserts it (only for an
+    existing post, doing nothing on the unique conflict), and moves
+    ``like_count`` by the difference. Selects ``found``, ``added``,
+    ``removed`` and the new ``like_count``.
+    """
+    post = select(Posts.id).where(Posts.id == post_id).cte('post')
+    removed = delete(Likes).where(Likes.post_id == post_id, Likes.user_id == user_id).returning(Likes.id).cte('removed')
+    added = (
+        postgresql_insert(Likes)
+        .from_select(['post_id', 'user_id'], select(post.c.id, literal(user_id)).where(~exists(select(removed.c.id))))
+        .on_conflict_do_nothing(index_elements=['user_id', 'post_id'])
+        .returning(Likes.id)
+        .cte('added')
+    )
+    added_count = select(func.count()).select_from(added).scalar_subquery()
+    removed_count = select(func.count()).select_from(removed).scalar_subquery()
+    bumped = bump_counter(Posts.like_count, post_id, added_count - removed_count).returning(Posts.like_count).cte('bumped')
+    return select(
+        exists(select(post.c.id)).label('found'),
+        exists(select(added.c.id)).label('added'),
+        exists(select(removed.c.id)).label('removed'),
+        select(bumped.c.like_count).scalar_subquery().label('like_count'),
+    )
+
+async def toggle_like(db:AsyncSession, post_id:int, user_id:int):
+    """Flip the user's like on a post; returns ``(liked, like_count)``.
+
+    On PostgreSQL this is a single round trip (``toggle_like_statement``).
+    Elsewhere the insert only selects a row when the post exists and does
+    nothing on the ``unique_user_post_like`` conflict, then an existing like
+    is deleted, then the counter moves. Either way concurrent double-taps
+    serialize on the unique index instead of raising. ``(None, None)`` means
+    no such post.
+    """
+    dialect = db.bind.dialect.name
+    post_exists = exists().where(Posts.id == post_id)
+    rows = select(literal(post_id), literal(user_id)).where(post_exists)
+
+    if dialect == 'postgresql':
+        row = (await db.execute(toggle_like_statement(post_id, user_id))).one()
+        if not row.found:
+            await db.rollback()
+            return None, None
+        if row.added or row.removed:
+            await db.commit()
+            return row.added, row.like_count
+        # the insert hit a like committed after this statement's snapshot,
+        # so nothing changed yet; undo that like below like any other
+        liked = False
+    elif dialect in upsert_inserts:
+        stmt = upsert_inserts[dialect](Likes).from_select(['post_id', 'user_id'], rows).on_conflict_do_nothing(index_elements=['user_id', 'post_id'])
+        liked = (await db.execute(stmt.returning(Likes.id))).first() is not None
+    else:
+        try:
+            async with db.begin_nested():
+                liked = (await db.execute(insert(Likes).from_select(['post_id', 'user_id'], rows))).rowcount == 1
+        except IntegrityError:
+            liked = False
+
+    if not liked:
+        deleted = (await db.execute(
+            delete(Likes).where(Likes.post_id == post_id, Likes.user_id == user_id).returning(Likes.id)
+        )).first()
+        if deleted is None:
+            await db.rollback()
+            return None, None
+
+    total_likes = await db.scalar(bump_counter(Posts.like_count, post_id, 1 if liked else -1).returning(Posts.like_count))
+    await db.commit()
+    return liked, total_likes
 
-db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 @router.get('/', status_code=status.HTTP_200_OK)
 @limiter.limit('30/minute')
-async def get_all_post(db:db_dependency, user:user_dependency, request:Request, paginate:Pagination=Depends(), search:Optional[str]=Query(None, min_length=3)):
+async def get_all_post(db:read_db_dependency, user:user_dependency, request:Request, paginate:Pagination=Depends(), projection:Projection=Depends(), search:Optional[str]=Query(None, min_length=3)):
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Unauthorized')
     
     if search:
-        post_model = db.scalars(select(Posts).where(or_(Posts.title.ilike(f"%{search}%"), Posts.content.ilike(f"%{search}%"))).limit(paginate.limit).offset(paginate.offset)).all()
-        total = db.scalar(select(func.count(Posts.id)).select_from(Posts).where(or_(Posts.title.ilike(f"%{search}%"), Posts.content.ilike(f"%{search}%"))))
+        offset = paginate.offset or 0
+        total, post_model = await get_search_backend(db).search(db, search, paginate.limit, offset, projection.columns())
         if not post_model:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='No posts found matching the search criteria')
-        return {'total':total, 'limit':paginate.limit, 'offset':paginate.offset, 'item':post_model}
+        return {'total':total, 'limit':paginate.limit, 'offset':offset, 'item':post_model}
     
-    post_model = db.query(Posts).all()
-    total = db.query(Posts).count()
+    paginate.keyset()
+    # plain column tuples: no identity map, no change tracking, only what is asked for
+    keys = [Posts.created_at, Posts.id]
+    rows, next_cursor, prev_cursor = await keyset_page(db, select(*projection.columns(*keys)), keys, paginate.limit, paginate.cursor, scalars=False)
 
-    return {'total':total, 'limit':paginate.limit, 'offset':paginate.offset, 'item':post_model}
+    page = {'limit':paginate.limit, 'item':rows, 'next_cursor':next_cursor, 'prev_cursor':prev_cursor}
+    return json_response(post_page_adapter, page, include=projection.include())
 
 @router.post('/', status_code=status.HTTP_201_CREATED)
 @limiter.limit('30/minute')
@@ -108,18 +351,64 @@ async def create_post(db:db_dependency, user:user_dependency, request:Request, n
     
     post_model = Posts(**newPost.model_dump(), author_id=user.get('id'))
     db.add(post_model)
-    db.commit()
+    await db.commit()
+
+@router.post('/bulk', status_code=status.HTTP_200_OK)
+@limiter.limit('5/minute')
+async def bulk_create_posts(db:db_dependency, user:user_dependency, request:Request, batch_size:int=Query(BULK_BATCH_SIZE, ge=1, le=BULK_MAX_BATCH_SIZE)):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Unauthorized')
+
+    # Core inserts skip the before_insert listener, so slugs are set here
+    def to_row(post:PostCreate):
+        return {'title':post.title, 'content':post.content, 'slug':generate_slug(post.title), 'author_id':user.get('id')}
+
+    return await bulk_insert(db, request, PostCreate, Posts.__table__, to_row, batch_size)
+
+@router.get('/export', status_code=status.HTTP_200_OK)
+@limiter.limit('5/minute')
+async def export_posts(user:user_dependency, request:Request, sessionmaker=Depends(get_sessionmaker), format:Literal['ndjson', 'csv']='ndjson', author_id:Optional[int]=Query(None, gt=0), published:Optional[bool]=None, created_after:Optional[datetime]=None, created_before:Optional[datetime]=None):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Unauthorized')
+
+    stmt = export_query(author_id, published, created_after, created_before)
+    headers = {'Content-Disposition':f'attachment; filename="posts.{format}"'}
+    return StreamingResponse(stream_export(sessionmaker, stmt, format), media_type=MEDIA_TYPES[format], headers=headers)
 
 @router.get('/{slug}', status_code=status.HTTP_200_OK, response_model=PostRead)
 @limiter.limit('30/minute')
-async def get_post(db:db_dependency, user:user_dependency, request:Request, slug:str):
+async def get_post(db:read_db_dependency, user:user_dependency, request:Request, slug:str, comments_limit:int=Query(POST_EMBED_COMMENTS, ge=0, le=100)):
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Unauthorized')
-    post  = db.query(Posts).filter(Posts.slug == slug).first()
-    if not post:
+
+    if is_conditional(request):
+        # answer revalidation from one indexed row before loading the graph
+        row = (await db.execute(
+            select(Posts.id, Posts.created_at, Posts.updated_at, Posts.comment_count, latest_comment_at).where(Posts.slug == slug)
+        )).first()
+        if row and not_modified(request, *post_validators(*row, comments_limit)):
+            return not_modified_response(*post_validators(*row, comments_limit))
+
+    async def load():
+        post = (await db.execute(
+            select(*PostRead.columns).join(Users, Users.id == Posts.author_id).where(Posts.slug == slug)
+        )).first()
+        if not post:
+            return None
+        comments, next_cursor = [], None
+        if comments_limit:
+            comments, next_cursor, _ = await comment_page(db, post.id, comments_limit)
+        etag, last_modified = post_validators(post.id, post.created_at, post.updated_at, post.comment_count, post.latest_comment_at, comments_limit)
+        # cached already encoded, so a hit costs no serialization at all
+        body = post_read_adapter.dump_json(post_read_adapter.validate_python(PostRead.from_row(post, comments, next_cursor))).decode()
+        return {'etag':etag, 'last_modified':last_modified, 'body':body}
+
+    # only the default embed size is cached, so invalidating post:{slug} suffices
+    entry = await cached(f'post:{slug}', load, lag=replica_lag(db)) if comments_limit == POST_EMBED_COMMENTS else await load()
+    if not entry:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Post not found')
     
-    return post
+    return json_body(entry['body'], headers=validator_headers(entry['etag'], entry['last_modified']))
 
 @router.put('/{id}', status_code=status.HTTP_204_NO_CONTENT)
 @limiter.limit('30/minute')
@@ -127,7 +416,7 @@ async def update_post(db:db_dependency, user:user_dependency, request:Request, u
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Unauthorized')
     
-    post_model = db.query(Posts).filter(Posts.id == id, Posts.author_id == user.get('id')).first()
+    post_model = await db.scalar(select(Posts).where(Posts.id == id, Posts.author_id == user.get('id')))
     if not post_model:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Post not found')
     
@@ -135,7 +424,8 @@ async def update_post(db:db_dependency, user:user_dependency, request:Request, u
     post_model.content = update.content
 
     db.add(post_model)
-    db.commit()
+    await db.commit()
+    await invalidate(*post_keys(slug=post_model.slug))
 
 @router.patch('/{id}', status_code=status.HTTP_204_NO_CONTENT)
 @limiter.limit('30/minute')
@@ -143,7 +433,7 @@ async def publish_post(db:db_dependency, user:user_dependency, request:Request,
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Unauthorized')
     
-    post_model = db.query(Posts).filter(Posts.id == id, Posts.author_id == user.get('id')).first()
+    post_model = await db.scalar(select(Posts).where(Posts.id == id, Posts.author_id == user.get('id')))
     if not post_model:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Post not found')
     
@@ -151,7 +441,8 @@ async def publish_post(db:db_dependency, user:user_dependency, request:Request,
     
 
     db.add(post_model)
-    db.commit()
+    await db.commit()
+    await invalidate(*post_keys(slug=post_model.slug))
 
 @router.delete('/{id}', status_code=status.HTTP_204_NO_CONTENT)
 @limiter.limit('30/minute')
@@ -159,59 +450,106 @@ async def delete_post(db:db_dependency, user:user_dependency, request:Request, i
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Unauthorized')
     
-    post_model = db.query(Posts).filter(Posts.id == id, Posts.author_id == user.get('id')).first()
+    post_model = await db.scalar(select(Posts).where(Posts.id == id, Posts.author_id == user.get('id')))
     if not post_model:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Post not found')
     
-    db.delete(post_model)
-    db.commit()
+    await db.delete(post_model)
+    await db.commit()
+    await invalidate(*post_keys(post_model.id, post_model.slug))
 
 @router.post('/{post_id}/comments', status_code=status.HTTP_201_CREATED)
 @limiter.limit('30/minute')
 async def add_comment(db:db_dependency, user:user_dependency, request:Request, newcomment:CommentCreate, post_id:int=Path(gt=0)):
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Unauthorized')
+    slug = await db.scalar(bump_counter(Posts.comment_count, post_id, 1).returning(Posts.slug))
+    if slug is None:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Post not found')
     comment = Comments(**newcomment.model_dump(), user_id=user.get('id'), post_id=post_id)
     db.add(comment)
-    db.commit()
+    await db.commit()
+    await invalidate(f'comments:{post_id}', f'post:{slug}')
+
+@router.post('/{post_id}/comments/bulk', status_code=status.HTTP_200_OK)
+@limiter.limit('5/minute')
+async def bulk_add_comments(db:db_dependency, user:user_dependency, request:Request, post_id:int=Path(gt=0), batch_size:int=Query(BULK_BATCH_SIZE, ge=1, le=BULK_MAX_BATCH_SIZE)):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Unauthorized')
+    slug = await db.scalar(select(Posts.slug).where(Posts.id == post_id))
+    if slug is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Post not found')
+
+    def to_row(comment:CommentCreate):
+        return {'content':comment.content, 'user_id':user.get('id'), 'post_id':post_id}
 
-@router.get('/{post_id}/comments', status_code=status.HTTP_200_OK, response_model=list[Commentread[authorread]])
+    async def count_comments(db, inserted:int):
+        await db.execute(bump_counter(Posts.comment_count, post_id, inserted))
+
+    result = await bulk_insert(db, request, CommentCreate, Comments.__table__, to_row, batch_size, count_comments)
+    await invalidate(f'comments:{post_id}', f'post:{slug}')
+    return result
+
+@router.get('/{post_id}/comments', status_code=status.HTTP_200_OK, response_model=CommentPage)
 @limiter.limit('30/minute')
-async def get_comment(db:db_dependency, user:user_dependency, request:Request, post_id:int=Path(gt=0)):
+async def get_comment(db:read_db_dependency, user:user_dependency, request:Request, paginate:Pagination=Depends(), post_id:int=Path(gt=0)):
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Unauthorized')
-    comments = db.query(Comments).filter(Comments.post_id == post_id).all()
-    return comments
+    paginate.keyset()
+
+    if is_conditional(request):
+        validators = comment_validators(post_id, *await thread_state(db, post_id), paginate.limit, paginate.cursor)
+        if not_modified(request, *validators):
+            return not_modified_response(*validators)
+
+    async def load():
+        comments, next_cursor, prev_cursor = await comment_page(db, post_id, paginate.limit, paginate.cursor)
+        # validators come from the same thread state the revalidation reads
+        etag, last_modified = comment_validators(post_id, *await thread_state(db, post_id), paginate.limit, paginate.cursor)
+        page = comment_page_adapter.validate_python({'limit':paginate.limit, 'item':comments, 'next_cursor':next_cursor, 'prev_cursor':prev_cursor})
+        return {'etag':etag, 'last_modified':last_modified, 'body':comment_page_adapter.dump_json(page).decode()}
+
+    generation = await cache_generation(f'comments:{post_id}')
+    entry = await cached(f'comments:{post_id}:{generation}:{paginate.limit}:{paginate.cursor or ""}', load, lag=replica_lag(db), family=f'comments:{post_id}')
+    return json_body(entry['body'], headers=validator_headers(entry['etag'], entry['last_modified']))
 
 @router.post('/{post_id}/like')
 async def like_post(db:db_dependency, user:user_dependency, post_id:int=Path(gt=0)):
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Unauthorized')
-    
-    post = db.scalar(select(Posts).where(Posts.id == post_id))
-    if not post:
+
+    liked, total_likes = await toggle_like(db, post_id, user.get('id'))
+    if liked is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Post not found')
-    
-    existing_like = db.scalar(select(Likes).where(Likes.post_id == post_id, Likes.user_id == user.get('id')))
-    if existing_like:
-        db.delete(existing_like)
-        db.commit()
-        return {'msg':'unliked'}
-    
-    new_like = Likes(user_id=user.get('id'), post_id=post_id)
-    db.add(new_like)
-    db.commit()
-    return {'msg':'liked'}
+    await invalidate(f'likes:{post_id}')
+    return {'msg':'liked' if liked else 'unliked', 'liked':liked, 'total_likes':total_likes}
 
 @router.get('/{post_id}/likes-count', status_code=status.HTTP_200_OK)
 @limiter.limit('30/minute')
-async def like_count(db:db_dependency, user:user_dependency, request:Request, post_id:int=Path(gt=0)):
+async def like_count(db:read_db_dependency, user:user_dependency, request:Request, post_id:int=Path(gt=0)):
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Unauthorized')
     
-    total_likes = db.scalar(select(func.count(Likes.id)).select_from(Likes).where(Likes.post_id == post_id))
-    results = db.scalars(select(Likes).where(Likes.post_id == post_id))
-    likers_list = results.all()
-    likers = [liker.user.username for liker in likers_list]
-    return {'total_likes':total_likes, 'likers':likers}
+
+    async def load():
+        total_likes = await db.scalar(select(Posts.like_count).where(Posts.id == post_id))
+        return None if total_likes is None else {'total_likes':total_likes}
+
+    likes = await cached(f'likes:{post_id}', load, lag=replica_lag(db))
+    if likes is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Post not found')
+    return likes
+
+@router.get('/{post_id}/likers', status_code=status.HTTP_200_OK)
+@limiter.limit('30/minute')
+async def get_likers(db:db_dependency, user:user_dependency, request:Request, paginate:Pagination=Depends(), post_id:int=Path(gt=0)):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Unauthorized')
+    paginate.keyset()
+
+    stmt = select(Likes.id, Users.id.label('user_id'), Users.username).join(Users, Users.id == Likes.user_id).where(Likes.post_id == post_id)
+    likers, next_cursor, prev_cursor = await keyset_page(db, stmt, [Likes.id], paginate.limit, paginate.cursor, scalars=False)
+    item = [{'id':liker.user_id, 'username':liker.username} for liker in likers]
+    return {'limit':paginate.limit, 'item':item, 'next_cursor':next_cursor, 'prev_cursor':prev_cursor}
 
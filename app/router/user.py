@@ -1,14 +1,17 @@
 from fastapi import APIRouter, HTTPException, Request, Depends, Path
 from starlette import status
 from pydantic import BaseModel, Field, EmailStr
-from passlib.context import CryptContext
 from typing import Annotated
-from sqlalchemy.orm import Session
 from sqlalchemy import select
-from ..database import sessionlocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_db
 from ..models import Users, Posts
 from ..limiter import limiter
+from ..passwords import hash_password
+from ..replicas import get_read_db
+from ..serialization import json_response
 from .auth import get_current_user
+from .blog import Projection, post_list_adapter
 from datetime import datetime
 
 router = APIRouter(
@@ -16,16 +19,9 @@ router = APIRouter(
     tags=['users']
 )
 
-def get_db():
-    db = sessionlocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
-bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 
 class UserCreate(BaseModel):
     username:str = Field(alias='userName')
@@ -44,11 +40,11 @@ async def create_user(db:db_dependency, request:Request, newUser:UserCreate):
     user_model = Users(
         username=newUser.username,
         email=newUser.email,
-        hashed_password=bcrypt_context.hash(newUser.password)
+        hashed_password=await hash_password(newUser.password)
     )
 
     db.add(user_model)
-    db.commit()
+    await db.commit()
 
 @router.get('/get', status_code=status.HTTP_200_OK, response_model=UserRead)
 @limiter.limit('30/minute')
@@ -56,7 +52,7 @@ async def get_user(db:db_dependency, user:user_dependency, request:Request):
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Unauthorized')
     
-    user_model = db.query(Users).filter(Users.id == user.get('id')).first()
+    user_model = await db.scalar(select(Users).where(Users.id == user.get('id')))
     if not user_model:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='user not found')
     
@@ -64,14 +60,14 @@ async def get_user(db:db_dependency, user:user_dependency, request:Request):
 
 @router.get('/posts', status_code=status.HTTP_200_OK)
 @limiter.limit('30/minute')
-async def get_user_post(db:db_dependency, user:user_dependency, request:Request):
+async def get_user_post(db:read_db_dependency, user:user_dependency, request:Request, projection:Projection=Depends()):
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Unauthorized')
     
-    user_model = db.scalars(select(Users).where(Users.id == user.get('id'))).first()
-    if not user_model:
+    user_id = await db.scalar(select(Users.id).where(Users.id == user.get('id')))
+    if not user_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='user not found')
-    users_post = db.scalars(select(Posts).where(Posts.author_id == user_model.id)).all()
-    return users_post
+    rows = (await db.execute(select(*projection.columns()).where(Posts.author_id == user_id))).all()
+    return json_response(post_list_adapter, rows, include=projection.include(paged=False))
 
 
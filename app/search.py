@@ -0,0 +1,144 @@
+from abc import ABC, abstractmethod
+from sqlalchemy import DDL, event, select, func, or_, table, column, literal_column, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models import Posts
+import logging, re
+
+logger = logging.getLogger(__name__)
+
+POST_COLUMNS = [Posts.id, Posts.title, Posts.content, Posts.slug, Posts.is_published, Posts.created_at, Posts.updated_at, Posts.author_id]
+HIGHLIGHT_START, HIGHLIGHT_END = '<mark>', '</mark>'
+
+# SQLite: external-content FTS5 index over posts, kept in sync by triggers so
+# ORM flushes, Core bulk inserts and cascaded deletes all update it
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(title, content, content='posts', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF title, content ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    "INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')",
+]
+SQLITE_DROP_DDL = ["DROP TABLE IF EXISTS posts_fts"]
+
+# PostgreSQL: stored generated tsvector column with a GIN index, maintained by
+# the database on every insert/update
+POSTGRES_DDL = [
+    """ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_posts_search_vector ON posts USING gin (search_vector)",
+]
+
+for statement in SQLITE_DDL:
+    event.listen(Posts.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in SQLITE_DROP_DDL:
+    event.listen(Posts.__table__, 'before_drop', DDL(statement).execute_if(dialect='sqlite'))
+for statement in POSTGRES_DDL:
+    event.listen(Posts.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+
+
+class SearchBackend(ABC):
+    @abstractmethod
+    async def search(self, db:AsyncSession, term:str, limit:int, offset:int, columns=POST_COLUMNS):
+        """``(total, rows)`` for posts matching ``term``, each row with ``rank`` and ``snippet``."""
+
+
+class SqliteFTSBackend(SearchBackend):
+    fts = table('posts_fts', column('rowid'))
+
+    def __init__(self, fallback:SearchBackend):
+        self.fallback = fallback
+        self.indexed = set()
+
+    async def has_index(self, db):
+        # posts_fts only exists where create_all or the migration built it;
+        # a database seeded some other way still gets (slower) search
+        url = str(db.bind.url)
+        if url in self.indexed:
+            return True
+        if await db.scalar(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts'")):
+            self.indexed.add(url)
+            return True
+        logger.warning('posts_fts is missing on %s, falling back to LIKE search', db.bind.url.render_as_string(hide_password=True))
+        return False
+
+    @staticmethod
+    def match_query(term:str):
+        # quote every token so user input can never be parsed as FTS5 syntax,
+        # and prefix-match it to keep the old substring-ish feel
+        tokens = re.findall(r'\w+', term)
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    async def search(self, db, term, limit, offset, columns=POST_COLUMNS):
+        if not await self.has_index(db):
+            return await self.fallback.search(db, term, limit, offset, columns)
+        query = self.match_query(term)
+        if not query:
+            return 0, []
+        fts_ref = literal_column('posts_fts')
+        matches = fts_ref.op('MATCH')(query)
+        rank = func.bm25(fts_ref, 2.0, 1.0)
+        snippet = func.snippet(fts_ref, -1, HIGHLIGHT_START, HIGHLIGHT_END, '…', 16)
+
+        total = await db.scalar(select(func.count()).select_from(self.fts).where(matches))
+        rows = (await db.execute(
+            select(*columns, rank.label('rank'), snippet.label('snippet'))
+            .select_from(self.fts.join(Posts, Posts.id == self.fts.c.rowid))
+            .where(matches)
+            .order_by(rank, Posts.id)
+            .limit(limit).offset(offset)
+        )).mappings().all()
+        return total, [dict(row) for row in rows]
+
+
+class PostgresFTSBackend(SearchBackend):
+    async def search(self, db, term, limit, offset, columns=POST_COLUMNS):
+        query = func.websearch_to_tsquery('english', term)
+        vector = literal_column('posts.search_vector')
+        matches = vector.op('@@')(query)
+
+        total = await db.scalar(select(func.count()).select_from(Posts).where(matches))
+        rank = func.ts_rank(vector, query).label('rank')
+        ranked = (
+            select(Posts.id, rank)
+            .where(matches)
+            .order_by(rank.desc(), Posts.id)
+            .limit(limit).offset(offset)
+            .subquery()
+        )
+        # headlines are costly, so only build them for the rows on this page
+        snippet = func.ts_headline('english', Posts.content, query, f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=1')
+        rows = (await db.execute(
+            select(*columns, ranked.c.rank, snippet.label('snippet'))
+            .join(ranked, ranked.c.id == Posts.id)
+            .order_by(ranked.c.rank.desc(), Posts.id)
+        )).mappings().all()
+        return total, [dict(row) for row in rows]
+
+
+class LikeSearchBackend(SearchBackend):
+    async def search(self, db, term, limit, offset, columns=POST_COLUMNS):
+        condition = or_(Posts.title.ilike(f"%{term}%"), Posts.content.ilike(f"%{term}%"))
+        total = await db.scalar(select(func.count(Posts.id)).where(condition))
+        rows = (await db.execute(
+            select(*columns).where(condition).order_by(Posts.id).limit(limit).offset(offset)
+        )).mappings().all()
+        return total, [dict(row, rank=None, snippet=None) for row in rows]
+
+
+fallback_backend = LikeSearchBackend()
+backends = {
+    'sqlite': SqliteFTSBackend(fallback_backend),
+    'postgresql': PostgresFTSBackend(),
+}
+
+def get_search_backend(db:AsyncSession) -> SearchBackend:
+    return backends.get(db.bind.dialect.name, fallback_backend)
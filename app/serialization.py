@@ -0,0 +1,49 @@
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from .instrumentation import current_stats, record_render
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson when it is installed, the stdlib encoder otherwise."""
+
+    def render(self, content):
+        if orjson is None:
+            return super().render(jsonable_encoder(content))
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class TimedJSONResponse(FastJSONResponse):
+    def render(self, content):
+        started = time.perf_counter()
+        try:
+            return super().render(content)
+        finally:
+            record_render(time.perf_counter() - started)
+
+
+def json_response(adapter:TypeAdapter, content, status_code:int=200, headers:dict | None=None, include=None):
+    """Validate ``content`` with a prebuilt adapter and encode it in one pass.
+
+    ``content`` may hold SQLAlchemy ``Row`` tuples or ORM objects as well as
+    dicts, since validation reads attributes. Returning the ``Response``
+    directly skips FastAPI's ``jsonable_encoder`` walk. ``include`` is passed
+    on to ``dump_json`` for sparse fieldsets. Encoding time is recorded like
+    ``TimedJSONResponse.render`` when the request is instrumented.
+    """
+    started = time.perf_counter()
+    body = adapter.dump_json(adapter.validate_python(content, from_attributes=True), include=include)
+    if current_stats.get() is not None:
+        record_render(time.perf_counter() - started)
+    return json_body(body, status_code, headers)
+
+def json_body(body:bytes | str, status_code:int=200, headers:dict | None=None):
+    """A response for JSON that is already encoded, e.g. a cached body."""
+    return Response(content=body, status_code=status_code, headers=headers, media_type='application/json')
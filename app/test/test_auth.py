@@ -3,6 +3,10 @@ from fastapi import status, HTTPException
 from app.router.auth import get_db, authenticate_user, create_access_token, SECRET_KEY, ALGORITHM, get_current_user
 from jose import jwt, JWTError
 from datetime import timedelta
+from app import passwords, tokens
+from passlib.context import CryptContext
+from sqlalchemy import select
+import time
 
 app.dependency_overrides[get_db] = override_get_db
 
@@ -22,14 +26,15 @@ def test_login_invalid_credentials(test_user):
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
     assert response.json()['detail'] == 'invalid credentials'
 
-def test_authenticate_user(test_user):
-    db = Testsessionlocal()
-    authenticated_user = authenticate_user(test_user.email, 'testpassword',db)
-    assert authenticated_user is not None
-    assert authenticated_user.email == test_user.email
+@pytest.mark.asyncio
+async def test_authenticate_user(test_user):
+    async with TestAsyncsessionlocal() as db:
+        authenticated_user = await authenticate_user(test_user.email, 'testpassword',db)
+        assert authenticated_user is not None
+        assert authenticated_user.email == test_user.email
 
-    wrong_user = authenticate_user('wrong', 'password', db)
-    assert wrong_user is False
+        wrong_user = await authenticate_user('wrong', 'password', db)
+        assert wrong_user is False
 
 def test_create_access_token(test_user):
     token = create_access_token(test_user.email, test_user.id, timedelta(minutes=30))
@@ -57,15 +62,131 @@ async def test_get_current_user_invalid_token(test_user):
         assert excinfo.value.status_code == status.HTTP_401_UNAUTHORIZED
         assert excinfo.value.detail == 'invalid credentials'
 
+def test_login_rejected_when_hash_pool_saturated(test_user, monkeypatch):
+    monkeypatch.setattr(passwords, 'pending', passwords.capacity)
+    response = client.post('/auth/token', data={
+        'username':'test@gmail.com',
+        'password':'testpassword'
+    })
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers['Retry-After'] == str(passwords.PASSWORD_HASH_RETRY_AFTER)
 
+def test_login_records_hash_latency(test_user):
+    before = passwords.hash_seconds.snapshot(operation='verify')['count']
+    client.post('/auth/token', data={
+        'username':'test@gmail.com',
+        'password':'testpassword'
+    })
+    assert passwords.hash_seconds.snapshot(operation='verify')['count'] == before + 1
 
+@pytest.mark.asyncio
+async def test_get_current_user_uses_token_cache(test_user):
+    token = create_access_token(test_user.email, test_user.id, timedelta(minutes=30))
+    await get_current_user(token)
+    hits = tokens.cache_hits.value()
+    assert await get_current_user(token) == {'email': test_user.email, 'id': test_user.id}
+    assert tokens.cache_hits.value() == hits + 1
+
+def test_token_cache_drops_expired():
+    cache = tokens.VerifiedTokenCache(max_entries=1)
+    cache.put(b'old', {'id': 1, 'exp': time.time() - 1})
+    assert cache.get(b'old') is None
+    cache.put(b'a', {'id': 1, 'exp': time.time() + 60})
+    cache.put(b'b', {'id': 2, 'exp': time.time() + 60})
+    assert cache.get(b'a') is None
+    assert cache.get(b'b') == {'id': 2, 'exp': pytest.approx(time.time() + 60, abs=5)}
 
+@pytest.mark.asyncio
+async def test_key_rotation(test_user, monkeypatch):
+    old_ring = tokens.KeyRing({'k1': 'first-secret'}, 'k1')
+    monkeypatch.setattr(tokens, 'key_ring', old_ring)
+    old_token = create_access_token(test_user.email, test_user.id, timedelta(minutes=30))
+    assert jwt.get_unverified_header(old_token)['kid'] == 'k1'
+
+    # k2 becomes active while k1 is still accepted
+    monkeypatch.setattr(tokens, 'key_ring', tokens.KeyRing({'k1': 'first-secret', 'k2': 'second-secret'}, 'k2'))
+    tokens.verified_tokens.clear()
+    new_token = create_access_token(test_user.email, test_user.id, timedelta(minutes=30))
+    assert jwt.get_unverified_header(new_token)['kid'] == 'k2'
+    assert (await get_current_user(old_token))['id'] == test_user.id
+    assert (await get_current_user(new_token))['id'] == test_user.id
+
+    # once k1 is retired its tokens are refused
+    monkeypatch.setattr(tokens, 'key_ring', tokens.KeyRing({'k2': 'second-secret'}, 'k2'))
+    tokens.verified_tokens.clear()
+    with pytest.raises(HTTPException):
+        await get_current_user(old_token)
 
+@pytest.mark.asyncio
+async def test_kidless_token_falls_back_to_secret_key(test_user, monkeypatch):
+    legacy_token = jwt.encode({'sub': test_user.email, 'id': test_user.id, 'exp': time.time() + 60}, SECRET_KEY, algorithm=ALGORITHM)
+    monkeypatch.setattr(tokens, 'key_ring', tokens.KeyRing({'k1': 'first-secret'}, 'k1', legacy_key=SECRET_KEY))
+    tokens.verified_tokens.clear()
+    assert (await get_current_user(legacy_token))['id'] == test_user.id
+
+    # without the legacy key it is refused
+    monkeypatch.setattr(tokens, 'key_ring', tokens.KeyRing({'k1': 'first-secret'}, 'k1'))
+    tokens.verified_tokens.clear()
+    with pytest.raises(HTTPException):
+        await get_current_user(legacy_token)
+
+def test_parse_keys():
+    assert tokens.parse_keys('a:one, b:two') == {'a': 'one', 'b': 'two'}
+    with pytest.raises(ValueError):
+        tokens.parse_keys('missing-secret')
+
+@pytest.fixture
+def refresh_token(test_user):
+    response = client.post('/auth/token', data={
+        'username':'test@gmail.com',
+        'password':'testpassword'
+    })
+    yield response.json()['refresh_token']
+    with engine.connect() as conn:
+        conn.execute(text('delete from refresh_tokens;'))
+        conn.commit()
+
+def test_refresh_skips_password_hashing(refresh_token):
+    before = passwords.hash_seconds.snapshot(operation='verify')['count']
+    response = client.post('/auth/refresh', json={'refresh_token': refresh_token})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data['token_type'] == 'bearer'
+    assert data['refresh_token'] != refresh_token
+    assert jwt.decode(data['access_token'], SECRET_KEY, algorithms=[ALGORITHM])['sub'] == 'test@gmail.com'
+    assert passwords.hash_seconds.snapshot(operation='verify')['count'] == before
+
+def test_refresh_reuse_revokes_family(refresh_token):
+    rotated = client.post('/auth/refresh', json={'refresh_token': refresh_token}).json()['refresh_token']
+
+    reused = client.post('/auth/refresh', json={'refresh_token': refresh_token})
+    assert reused.status_code == status.HTTP_401_UNAUTHORIZED
+    # the legitimate successor is revoked too, forcing a fresh login
+    assert client.post('/auth/refresh', json={'refresh_token': rotated}).status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_revoke_refresh_token(refresh_token):
+    assert client.post('/auth/revoke', json={'refresh_token': refresh_token}).status_code == status.HTTP_204_NO_CONTENT
+    assert client.post('/auth/refresh', json={'refresh_token': refresh_token}).status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_refresh_unknown_token():
+    response = client.post('/auth/refresh', json={'refresh_token': 'not-a-token'})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
-
-
-
-
-
-
-
+def test_login_rehashes_outdated_hash(test_user, monkeypatch):
+    monkeypatch.setattr(passwords, 'password_context', CryptContext(schemes=['bcrypt'], bcrypt__default_rounds=5, bcrypt__min_rounds=5))
+    response = client.post('/auth/token', data={
+        'username':'test@gmail.com',
+        'password':'testpassword'
+    })
+    assert response.status_code == status.HTTP_200_OK
+    db = Testsessionlocal()
+    hashed = db.scalar(select(Users.hashed_password).where(Users.email == 'test@gmail.com'))
+    assert hashed.startswith('$2b$05$')
+    assert passwords.password_context.verify('testpassword', hashed)
+    with engine.connect() as conn:
+        conn.execute(text('delete from refresh_tokens;'))
+        conn.commit()
+
+def test_calibrate_bcrypt_rounds():
+    assert passwords.calibrate_bcrypt_rounds(0) == passwords.BCRYPT_MIN_ROUNDS
+    assert passwords.calibrate_bcrypt_rounds(1e9) == passwords.BCRYPT_MAX_ROUNDS
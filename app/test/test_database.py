@@ -0,0 +1,130 @@
+from utils import *
+from sqlalchemy import text
+from app.database import make_engine, make_async_engine, pool_checkout_wait, pool_in_use
+from app.indexes import audit_indexes
+from app import replicas
+from app.router.blog import get_current_user
+import pytest_asyncio, time
+from starlette.requests import Request
+
+app.dependency_overrides[get_current_user] = override_get_current_user
+
+def test_sqlite_engine_pragmas(tmp_path):
+    sqlite_engine = make_engine(f'sqlite:///{tmp_path}/pragmas.db', 'pragmas')
+    with sqlite_engine.connect() as conn:
+        assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert conn.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+        assert conn.execute(text('PRAGMA synchronous')).scalar() == 1
+    sqlite_engine.dispose()
+
+def test_pool_metrics(tmp_path):
+    sqlite_engine = make_engine(f'sqlite:///{tmp_path}/pool.db', 'pool_metrics')
+    with sqlite_engine.connect():
+        assert pool_in_use.value(engine='pool_metrics') == 1
+    assert pool_in_use.value(engine='pool_metrics') == 0
+    assert pool_checkout_wait.snapshot(engine='pool_metrics')['count'] == 1
+    sqlite_engine.dispose()
+
+@pytest.mark.asyncio
+async def test_async_sqlite_engine_pragmas(tmp_path):
+    sqlite_engine = make_async_engine(f'sqlite:///{tmp_path}/async.db', 'async_pragmas')
+    async with sqlite_engine.connect() as conn:
+        assert (await conn.execute(text('PRAGMA journal_mode'))).scalar() == 'wal'
+    assert pool_in_use.value(engine='async_pragmas') == 0
+    await sqlite_engine.dispose()
+
+def test_index_audit_clean():
+    assert audit_indexes(engine) == []
+
+def test_index_audit_reports_gap():
+    with engine.connect() as conn:
+        conn.execute(text('DROP INDEX ix_comments_post_id_created_at'))
+        conn.commit()
+    try:
+        gaps = audit_indexes(engine)
+        assert ('comments', ('post_id', 'created_at'), 'GET /posts/{post_id}/comments') in gaps
+        assert ('comments', ('post_id',), 'foreign key comments.post_id -> posts.id') in gaps
+    finally:
+        with engine.connect() as conn:
+            conn.execute(text('CREATE INDEX ix_comments_post_id_created_at ON comments (post_id, created_at)'))
+            conn.commit()
+
+def test_comment_listing_uses_index():
+    with engine.connect() as conn:
+        plan = conn.execute(text('EXPLAIN QUERY PLAN SELECT * FROM comments WHERE post_id = 1')).all()
+    assert any('ix_comments_post_id_created_at' in row[-1] for row in plan)
+
+@pytest_asyncio.fixture
+async def replica_set(tmp_path):
+    # two SQLite files stand in for two replicas
+    engines = [make_async_engine(f'sqlite:///{tmp_path}/replica{i}.db', f'test_replica{i}') for i in (1, 2)]
+    yield replicas.ReplicaSet([replicas.Replica(f'test_replica{i}', engine) for i, engine in enumerate(engines, 1)])
+    for engine in engines:
+        await engine.dispose()
+
+def read_request(cookie=None):
+    headers = [(b'cookie', cookie.encode())] if cookie else []
+    return Request({'type': 'http', 'method': 'GET', 'headers': headers, 'client': ('10.0.0.9', 1234)})
+
+@pytest.mark.asyncio
+async def test_replicas_round_robin_and_failover(replica_set):
+    assert [(await replica_set.pick()).name for _ in range(4)] == ['test_replica1', 'test_replica2'] * 2
+    replica_set.replicas[0].mark_down()
+    assert [(await replica_set.pick()).name for _ in range(2)] == ['test_replica2'] * 2
+    replica_set.replicas[1].mark_down()
+    assert await replica_set.pick() is None
+
+@pytest.mark.asyncio
+async def test_replica_health_check_failure(tmp_path):
+    broken = replicas.Replica('broken', make_async_engine(f'sqlite:///{tmp_path}/missing/dir/replica.db', 'broken_replica'))
+    assert not await broken.healthy()
+    assert broken.down_until > 0
+    assert not await broken.healthy()
+
+@pytest.mark.asyncio
+async def test_reads_stick_to_primary_after_write(replica_set, monkeypatch):
+    monkeypatch.setattr(replicas, 'replicas', replica_set)
+    assert (await replicas.route_read(read_request())).name == 'test_replica1'
+
+    async def write(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 204, 'headers': []})
+    sent = []
+    async def send(message):
+        sent.append(message)
+    await replicas.ReadYourWritesMiddleware(write)({'type': 'http', 'method': 'PUT', 'headers': []}, None, send)
+    cookie = dict(sent[0]['headers'])[b'set-cookie'].decode().split(';')[0]
+
+    # the cookie pins this client to the primary on any worker
+    assert await replicas.route_read(read_request(cookie)) is None
+    # other clients keep reading from the replicas
+    assert (await replicas.route_read(read_request())).name == 'test_replica2'
+    assert (await replicas.route_read(read_request(f'{replicas.REPLICA_STICKY_COOKIE}=1.0'))).name == 'test_replica1'
+
+@pytest.mark.asyncio
+async def test_replica_reads_wait_out_invalidation(monkeypatch):
+    async def load():
+        return 'lagging'
+    await cache.invalidate('post:replica')
+    # the replica may not have the write behind this invalidation yet
+    assert await cache.cached('post:replica', load, lag=5) == 'lagging'
+    assert await cache.backend.get('post:replica') is None
+
+    later = time.time() + 6
+    monkeypatch.setattr(cache.time, 'time', lambda: later)
+    assert await cache.cached('post:replica', load, lag=5) == 'lagging'
+    assert await cache.backend.get('post:replica') == 'lagging'
+
+def test_replica_reads_fill_cache(test_user, test_post):
+    async def replica_db():
+        async with TestAsyncsessionlocal() as db:
+            db.info['replica'] = 'test_replica1'
+            yield db
+    app.dependency_overrides[replicas.get_read_db] = replica_db
+    try:
+        client.get('/posts/test-post-1')
+        with count_queries() as statements:
+            for _ in range(3):
+                assert client.get('/posts/test-post-1').status_code == 200
+    finally:
+        app.dependency_overrides[replicas.get_read_db] = override_get_db
+    assert statements == []
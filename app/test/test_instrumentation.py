@@ -0,0 +1,50 @@
+from utils import *
+from app.replicas import get_read_db
+from fastapi import status
+from app import instrumentation, metrics
+from app.instrumentation import InstrumentationMiddleware
+from app.router.blog import get_db, get_current_user
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
+app.dependency_overrides[get_current_user] = override_get_current_user
+instrumented = TestClient(InstrumentationMiddleware(app))
+
+def test_request_metrics(test_user, test_post):
+    before = instrumentation.request_seconds.snapshot(route='/posts/{post_id}/likes-count', method='GET', status=200)['count']
+    response = instrumented.get('/posts/1/likes-count')
+    assert response.status_code == status.HTTP_200_OK
+    assert 'desc="1 queries"' in response.headers['server-timing']
+    after = instrumentation.request_seconds.snapshot(route='/posts/{post_id}/likes-count', method='GET', status=200)['count']
+    assert after == before + 1
+
+def test_metrics_endpoint(test_user, test_post):
+    instrumented.get('/posts/1/likes-count')
+    body = client.get('/metrics').text
+    assert '# TYPE http_request_seconds histogram' in body
+    assert 'http_request_seconds_count{method="GET",route="/posts/{post_id}/likes-count",status="200"}' in body
+    assert 'password_hash_seconds' in body
+
+def test_profile_on_header(test_user, test_post, tmp_path, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'PROFILING_ENABLED', True)
+    monkeypatch.setattr(instrumentation, 'PROFILE_DIR', str(tmp_path))
+    assert 'x-profile-id' not in instrumented.get('/posts/1/likes-count').headers
+    response = instrumented.get('/posts/1/likes-count', headers={'X-Profile': '1'})
+    assert (tmp_path / response.headers['x-profile-id']).exists()
+
+def test_render_histogram_is_cumulative():
+    histogram = metrics.histogram('test_render_seconds', 'test only', buckets=(0.1, 1.0))
+    histogram.observe(0.05, route='/x')
+    histogram.observe(0.5, route='/x')
+    body = metrics.render()
+    assert 'test_render_seconds_bucket{route="/x",le="0.1"} 1' in body
+    assert 'test_render_seconds_bucket{route="/x",le="1.0"} 2' in body
+    assert 'test_render_seconds_bucket{route="/x",le="+Inf"} 2' in body
+
+def test_adapter_responses_record_render_time(test_user, test_post):
+    before = instrumentation.render_seconds.snapshot()['count']
+    response = instrumented.get('/posts/')
+    assert response.status_code == status.HTTP_200_OK
+    assert instrumentation.render_seconds.snapshot()['count'] == before + 1
+    render_ms = float(response.headers['server-timing'].split('render;dur=')[1].split(',')[0])
+    assert render_ms > 0
@@ -0,0 +1,44 @@
+from utils import *
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from starlette.requests import Request
+from datetime import timedelta
+from app.limiter import SQLiteStorage, rate_limit_key
+from app.router.auth import create_access_token
+from concurrent.futures import ThreadPoolExecutor
+
+def make_request(headers=None):
+    raw = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    return Request({'type': 'http', 'headers': raw, 'client': ('10.0.0.7', 1234)})
+
+def test_sqlite_storage_fixed_window(tmp_path):
+    storage = storage_from_string(f'sqlite:///{tmp_path}/limits.db')
+    assert isinstance(storage, SQLiteStorage)
+    limiter = FixedWindowRateLimiter(storage)
+    item = parse('3/minute')
+    assert [limiter.hit(item, 'client') for _ in range(4)] == [True, True, True, False]
+    assert limiter.hit(item, 'other-client')
+
+    storage.clear(item.key_for('client'))
+    assert limiter.hit(item, 'client')
+
+def test_sqlite_storage_window_expires(tmp_path):
+    storage = SQLiteStorage(f'sqlite:///{tmp_path}/limits.db')
+    assert storage.incr('key', expiry=-1) == 1
+    assert storage.get('key') == 0
+    assert storage.incr('key', expiry=60) == 1
+    assert storage.incr('key', expiry=60, amount=2) == 3
+
+def test_sqlite_storage_shared_between_connections(tmp_path):
+    uri = f'sqlite:///{tmp_path}/limits.db'
+    storages = [SQLiteStorage(uri) for _ in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda i: storages[i % 4].incr('shared', 60), range(200)))
+    assert storages[0].get('shared') == 200
+
+def test_rate_limit_key_per_user(test_user):
+    token = create_access_token(test_user.email, test_user.id, timedelta(minutes=5))
+    assert rate_limit_key(make_request({'Authorization': f'Bearer {token}'})) == f'user:{test_user.id}'
+    assert rate_limit_key(make_request({'Authorization': 'Bearer garbage'})) == '10.0.0.7'
+    assert rate_limit_key(make_request()) == '10.0.0.7'
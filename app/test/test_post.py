@@ -1,9 +1,19 @@
 from utils import *
+from app.replicas import get_read_db
 from fastapi import status
-from app.router.blog import get_db, get_current_user
+from app.router.blog import get_db, get_current_user, get_sessionmaker, toggle_like_statement
+from app.cli import reconcile_counters
+from app import search
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import asyncio, base64, csv, fnmatch, io, json, time
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
 app.dependency_overrides[get_current_user] = override_get_current_user
+app.dependency_overrides[get_sessionmaker] = override_get_sessionmaker
 
 def test_create_post(test_post):
     response = client.post('/posts/', json={
@@ -16,9 +26,9 @@ def test_get_posts(test_post):
     response = client.get('/posts/')
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == {
-        'total':1,
         'limit':10,
-        'offset':0,
+        'next_cursor': None,
+        'prev_cursor': None,
         'item': [{
             'id': 1,
             'title': 'Test Post',
@@ -27,10 +37,123 @@ def test_get_posts(test_post):
             'is_published': False,
             'created_at': test_post.created_at.isoformat(),
             'updated_at': test_post.updated_at.isoformat() if test_post.updated_at else None,
-            'author_id': 1
+            'author_id': 1,
+            'like_count': 0,
+            'comment_count': 0
         }]
     }
 
+def test_get_posts_cursor_pagination(test_post):
+    db = Testsessionlocal()
+    db.add_all([Posts(title=f'Post {i}', content='content', slug=f'post-{i}', author_id=1) for i in range(2, 7)])
+    db.commit()
+
+    first = client.get('/posts/', params={'limit': 2}).json()
+    assert [p['slug'] for p in first['item']] == ['post-6', 'post-5']
+    assert first['prev_cursor'] is None
+
+    second = client.get('/posts/', params={'limit': 2, 'cursor': first['next_cursor']}).json()
+    assert [p['slug'] for p in second['item']] == ['post-4', 'post-3']
+
+    last = client.get('/posts/', params={'limit': 2, 'cursor': second['next_cursor']}).json()
+    assert [p['slug'] for p in last['item']] == ['post-2', 'test-post-1']
+    assert last['next_cursor'] is None
+
+    back = client.get('/posts/', params={'limit': 2, 'cursor': second['prev_cursor']}).json()
+    assert [p['slug'] for p in back['item']] == ['post-6', 'post-5']
+    assert back['prev_cursor'] is None
+
+def test_get_posts_rejects_malformed_cursor(test_post):
+    def cursor(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+    for key in (['2026-01-01T00:00:00', [1]], ['2026-01-01T00:00:00', '1'], ['2026-01-01T00:00:00', True], [1, 1], ['not a date', 1]):
+        response = client.get('/posts/', params={'cursor': cursor({'d': 'next', 'k': key})})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST, key
+        assert response.json() == {'detail': 'invalid cursor'}
+
+def test_get_posts_sparse_fields(test_post):
+    db = Testsessionlocal()
+    db.add_all([Posts(title=f'Post {i}', content='a long body', slug=f'post-{i}', author_id=1) for i in range(2, 4)])
+    db.commit()
+
+    with count_queries() as statements:
+        first = client.get('/posts/', params={'limit': 2, 'fields': 'title', 'excerpt': 6}).json()
+    assert first['item'] == [{'title': 'Post 3'}, {'title': 'Post 2'}]
+    # the cursor columns are still selected, the unrequested ones are not
+    assert 'content' not in statements[0] and 'like_count' not in statements[0]
+    second = client.get('/posts/', params={'limit': 2, 'fields': 'slug,content', 'excerpt': 6, 'cursor': first['next_cursor']}).json()
+    assert second['item'] == [{'slug': 'test-post-1', 'content': 'This i'}]
+
+def test_cursor_pagination_over_server_default_timestamps(test_user, test_post):
+    # raw inserts take created_at from CURRENT_TIMESTAMP, like rows written
+    # before the client side default existed
+    with engine.connect() as conn:
+        for i in range(2, 6):
+            conn.execute(text("insert into posts (title, content, slug, author_id) values ('raw', 'raw', :slug, 1)"), {'slug': f's{i}'})
+            conn.execute(text("insert into comments (content, user_id, post_id) values (:content, 1, 1)"), {'content': f'raw {i}'})
+        conn.commit()
+
+    def follow(path):
+        seen, cursor = [], None
+        for _ in range(10):
+            page = client.get(path, params={'limit': 1, 'cursor': cursor} if cursor else {'limit': 1}).json()
+            seen += page['item']
+            cursor = page['next_cursor']
+            if cursor is None:
+                return seen
+        raise AssertionError(f'{path} did not reach the last page: {seen}')
+
+    assert sorted(p['slug'] for p in follow('/posts/')) == ['s2', 's3', 's4', 's5', 'test-post-1']
+    assert [c['content'] for c in follow('/posts/1/comments')] == ['raw 2', 'raw 3', 'raw 4', 'raw 5']
+    with engine.connect() as conn:
+        conn.execute(text('delete from comments;'))
+        conn.commit()
+
+def test_get_posts_invalid_cursor(test_post):
+    response = client.get('/posts/', params={'cursor': 'not-a-cursor'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_slugs_generated_in_batch(test_post):
+    # slugs come from the insert itself, not from lookups inside the flush
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    db = Testsessionlocal()
+    db.add_all([Posts(title='Same Title!', content='content', author_id=1) for _ in range(50)])
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        db.commit()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert not any(statement.lstrip().upper().startswith('SELECT') for statement in statements)
+    slugs = db.scalars(select(Posts.slug).where(Posts.title == 'Same Title!')).all()
+    assert len(set(slugs)) == 50
+    assert all(slug.startswith('same-title-') for slug in slugs)
+
+def test_export_posts_ndjson(test_post):
+    db = Testsessionlocal()
+    db.add_all([Posts(title=f'Post {i}', content='content', slug=f'post-{i}', author_id=2, is_published=True) for i in range(2, 5)])
+    db.commit()
+
+    response = client.get('/posts/export')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row['slug'] for row in rows] == ['test-post-1', 'post-2', 'post-3', 'post-4']
+
+    filtered = client.get('/posts/export', params={'author_id': 2, 'published': True}).text.splitlines()
+    assert len(filtered) == 3
+
+def test_export_posts_csv(test_post):
+    response = client.get('/posts/export', params={'format': 'csv', 'published': False})
+    assert response.headers['content-type'].startswith('text/csv')
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(row['id'], row['slug']) for row in rows] == [('1', 'test-post-1')]
+
+def test_export_posts_invalid_format(test_post):
+    assert client.get('/posts/export', params={'format': 'xml'}).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
 def test_get_post(test_user, test_post, test_comment):
     response = client.get('/posts/test-post-1')
     assert response.status_code == status.HTTP_200_OK
@@ -52,17 +175,405 @@ def test_get_post(test_user, test_post, test_comment):
                     'username': 'testuser'
                 }
             }
-        ]
-        
+        ],
+        'comments_next_cursor': None
     }
 
 def test_get_post_invalid(test_post):
     response = client.get('/posts/test-post-2')
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert response.json()['detail'] == 'Post not found'
-        
-    
 
+def test_search_posts(test_post):
+    db = Testsessionlocal()
+    db.add(Posts(title='Gardening notes', content='Tomatoes need plenty of sunlight.', slug='gardening', author_id=1))
+    db.commit()
+
+    response = client.get('/posts/', params={'search': 'tomato'})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data['total'] == 1
+    assert data['item'][0]['slug'] == 'gardening'
+    assert '<mark>Tomatoes</mark>' in data['item'][0]['snippet']
+
+def test_offset_only_pages_search(test_user, test_post):
+    assert client.get('/posts/', params={'search': 'test post', 'offset': 0}).json()['offset'] == 0
+    # past the only match, not refused
+    assert client.get('/posts/', params={'search': 'test post', 'offset': 1}).status_code == status.HTTP_404_NOT_FOUND
+    for path in ('/posts/', '/posts/1/comments', '/posts/1/likers'):
+        response = client.get(path, params={'limit': 1, 'offset': 2})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST, path
+
+def test_search_posts_sparse_fields(test_post):
+    response = client.get('/posts/', params={'search': 'test post', 'fields': 'slug,content', 'excerpt': 4})
+    item = response.json()['item'][0]
+    assert {key: item[key] for key in ('slug', 'content')} == {'slug': 'test-post-1', 'content': 'This'}
+    # ranking output stays, unrequested columns are not selected
+    assert set(item) == {'slug', 'content', 'rank', 'snippet'}
+
+def test_search_posts_tracks_updates(test_post):
+    db = Testsessionlocal()
+    post = db.get(Posts, 1)
+    post.content = 'Rewritten about bicycles.'
+    db.commit()
+
+    assert client.get('/posts/', params={'search': 'bicycles'}).json()['total'] == 1
+    response = client.get('/posts/', params={'search': 'test post'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['item'][0]['snippet'] is not None
+
+@pytest.mark.asyncio
+async def test_search_falls_back_without_fts_table(tmp_path):
+    bare = create_engine(f'sqlite:///{tmp_path}/bare.db')
+    with bare.connect() as conn:
+        conn.execute(text('create table posts (id integer primary key, title text, content text, slug text, is_published boolean, created_at datetime, updated_at datetime, author_id integer)'))
+        conn.execute(text("insert into posts (id, title, content, slug) values (1, 'Python tips', 'body', 'python-tips')"))
+        conn.commit()
+    bare_async = create_async_engine(f'sqlite+aiosqlite:///{tmp_path}/bare.db')
+    async with async_sessionmaker(bind=bare_async)() as db:
+        total, rows = await search.get_search_backend(db).search(db, 'python', 10, 0)
+    await bare_async.dispose()
+    assert total == 1 and rows[0]['slug'] == 'python-tips'
+
+def test_search_posts_no_match(test_post):
+    response = client.get('/posts/', params={'search': 'nothing here'})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_like_post_toggle(test_user, test_post):
+    response = client.post('/posts/1/like')
+    assert response.json() == {'msg': 'liked', 'liked': True, 'total_likes': 1}
+    assert client.get('/posts/1/likes-count').json() == {'total_likes': 1}
+    likers = client.get('/posts/1/likers').json()
+    assert likers['item'] == [{'id': 1, 'username': 'testuser'}]
+
+    response = client.post('/posts/1/like')
+    assert response.json() == {'msg': 'unliked', 'liked': False, 'total_likes': 0}
+    assert client.get('/posts/1/likes-count').json() == {'total_likes': 0}
+    assert client.get('/posts/1/likers').json()['item'] == []
+
+def test_like_missing_post(test_user):
+    response = client.post('/posts/99/like')
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_like_toggle_concurrent(test_user, test_post):
+    # every request toggles exactly once, so an even number must end unliked
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(lambda _: client.post('/posts/1/like'), range(40)))
+
+    assert all(response.status_code == status.HTTP_200_OK for response in responses)
+    assert sum(1 if r.json()['liked'] else -1 for r in responses) == 0
+    with engine.connect() as conn:
+        likes = conn.execute(text('select count(*) from likes where post_id = 1')).scalar()
+        like_count = conn.execute(text('select like_count from posts where id = 1')).scalar()
+    assert likes == like_count == 0
+
+def test_like_toggle_is_one_postgres_statement():
+    sql = str(toggle_like_statement(1, 1).compile(dialect=postgresql.dialect()))
+    assert sql.startswith('WITH post AS')
+    assert 'DELETE FROM likes' in sql and 'ON CONFLICT (user_id, post_id) DO NOTHING' in sql
+    assert 'UPDATE posts SET updated_at=posts.updated_at, like_count=' in sql
+
+def test_like_count_query_budget(test_user, test_post):
+    with count_queries() as statements:
+        response = client.get('/posts/1/likes-count')
+    assert response.json() == {'total_likes': 0}
+    assert len(statements) == 1
+
+def test_like_count_cached_until_like(test_user, test_post):
+    client.get('/posts/1/likes-count')
+    with count_queries() as statements:
+        assert client.get('/posts/1/likes-count').json() == {'total_likes': 0}
+    assert statements == []
+
+    client.post('/posts/1/like')
+    assert client.get('/posts/1/likes-count').json() == {'total_likes': 1}
+    client.post('/posts/1/like')
+
+def test_get_post_cache_invalidated_by_writes(test_user, test_post):
+    assert client.get('/posts/test-post-1').json()['comments'] == []
+    with count_queries() as statements:
+        client.get('/posts/test-post-1')
+    assert statements == []
+
+    client.post('/posts/1/comments', json={'content': 'fresh'})
+    assert [c['content'] for c in client.get('/posts/test-post-1').json()['comments']] == ['fresh']
+    assert [c['content'] for c in client.get('/posts/1/comments').json()['item']] == ['fresh']
+
+    client.put('/posts/1', json={'title': 'Renamed', 'content': 'new body'})
+    assert client.get('/posts/test-post-1').json()['title'] == 'Renamed'
+
+    client.delete('/posts/1')
+    assert client.get('/posts/test-post-1').status_code == status.HTTP_404_NOT_FOUND
+    assert client.get('/posts/1/comments').json()['item'] == []
+    with engine.connect() as conn:
+        conn.execute(text('delete from comments;'))
+        conn.commit()
+
+def test_get_post_conditional(test_user, test_post):
+    response = client.get('/posts/test-post-1')
+    etag, last_modified = response.headers['etag'], response.headers['last-modified']
+
+    with count_queries() as statements:
+        revalidated = client.get('/posts/test-post-1', headers={'If-None-Match': etag})
+    assert revalidated.status_code == status.HTTP_304_NOT_MODIFIED
+    assert revalidated.headers['etag'] == etag
+    assert len(statements) == 1
+    assert client.get('/posts/test-post-1', headers={'If-Modified-Since': last_modified}).status_code == status.HTTP_304_NOT_MODIFIED
+
+    client.post('/posts/1/comments', json={'content': 'changes the etag'})
+    changed = client.get('/posts/test-post-1', headers={'If-None-Match': etag})
+    assert changed.status_code == status.HTTP_200_OK
+    assert changed.headers['etag'] != etag
+    with engine.connect() as conn:
+        conn.execute(text('delete from comments;'))
+        conn.commit()
+
+def test_get_post_modified_by_new_comment(test_user, test_post):
+    # Last-Modified has one-second resolution, so age the post first
+    with engine.connect() as conn:
+        conn.execute(text("update posts set created_at = '2020-01-01 00:00:00', updated_at = '2020-01-01 00:00:00'"))
+        conn.commit()
+    last_modified = client.get('/posts/test-post-1').headers['last-modified']
+    assert client.get('/posts/test-post-1', headers={'If-Modified-Since': last_modified}).status_code == status.HTTP_304_NOT_MODIFIED
+
+    client.post('/posts/1/comments', json={'content': 'changes last-modified'})
+    changed = client.get('/posts/test-post-1', headers={'If-Modified-Since': last_modified})
+    assert changed.status_code == status.HTTP_200_OK
+    assert changed.headers['last-modified'] != last_modified
+    assert [comment['content'] for comment in changed.json()['comments']] == ['changes last-modified']
+    # the fast path and the full load agree on the new date
+    assert client.get('/posts/test-post-1', headers={'If-Modified-Since': changed.headers['last-modified']}).status_code == status.HTTP_304_NOT_MODIFIED
+    with engine.connect() as conn:
+        conn.execute(text('delete from comments;'))
+        conn.commit()
+
+def test_get_post_etag_changes_within_a_second(test_user, test_post):
+    client.put('/posts/1', json={'title': 'A', 'content': 'body'})
+    etag = client.get('/posts/test-post-1').headers['etag']
+    client.put('/posts/1', json={'title': 'B', 'content': 'body'})
+    response = client.get('/posts/test-post-1', headers={'If-None-Match': etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['title'] == 'B'
+    assert response.headers['etag'] != etag
+
+def test_get_comments_conditional(test_user, test_post, test_comment):
+    etag = client.get('/posts/1/comments').headers['etag']
+    assert client.get('/posts/1/comments', headers={'If-None-Match': etag}).status_code == status.HTTP_304_NOT_MODIFIED
+    assert client.get('/posts/1/comments', headers={'If-None-Match': '"stale"'}).status_code == status.HTTP_200_OK
+
+@pytest.mark.asyncio
+async def test_cached_single_flight():
+    calls = 0
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {'value': calls}
+
+    results = await asyncio.gather(*(cache.cached('test:single-flight', load) for _ in range(10)))
+    assert calls == 1
+    assert results == [{'value': 1}] * 10
+
+def test_memory_cache_lru_and_ttl():
+    lru = cache.MemoryCache(max_entries=2)
+    async def scenario():
+        await lru.set('a', 1, ttl=60)
+        await lru.set('b', 2, ttl=60)
+        await lru.get('a')
+        await lru.set('c', 3, ttl=60)
+        evicted = [await lru.get(key) for key in 'abc']
+        await lru.set('c', 3, ttl=-1)
+        return evicted, await lru.get('c')
+    assert asyncio.run(scenario()) == ([1, None, 3], None)
+
+class FakeRedis:
+    """Just the redis.asyncio client calls RedisCache makes."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        entry = self.data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    async def set(self, key, value, px):
+        self.data[key] = (time.monotonic() + px / 1000, value.encode())
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def scan_iter(self, match):
+        for key in list(self.data):
+            if fnmatch.fnmatch(key, match):
+                yield key
+
+def test_redis_cache_round_trip():
+    client = FakeRedis()
+    redis = cache.RedisCache(client=client, prefix='test:')
+    async def scenario():
+        await redis.set('post:1', {'id': 1, 'created_at': datetime(2026, 1, 1)}, ttl=60)
+        await redis.set('post:2', {'id': 2}, ttl=-1)
+        await client.set('other:1', '1', px=60000)
+        value = await redis.get('post:1')
+        expired = await redis.get('post:2')
+        await redis.delete('post:1')
+        deleted = await redis.get('post:1')
+        await redis.set('post:3', {'id': 3}, ttl=60)
+        await redis.clear()
+        return value, expired, deleted, sorted(client.data)
+    # values come back as JSON, so datetimes arrive as strings
+    assert asyncio.run(scenario()) == ({'id': 1, 'created_at': '2026-01-01 00:00:00'}, None, None, ['other:1'])
+
+def test_cache_backend_is_abstract():
+    class Incomplete(cache.CacheBackend):
+        async def get(self, key):
+            return None
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_likers_pagination(busy_thread):
+    db = Testsessionlocal()
+    db.add_all([Likes(user_id=i, post_id=1) for i in range(1, 6)])
+    db.commit()
+
+    first = client.get('/posts/1/likers', params={'limit': 3}).json()
+    assert [u['username'] for u in first['item']] == ['reader5', 'reader4', 'reader3']
+    second = client.get('/posts/1/likers', params={'limit': 3, 'cursor': first['next_cursor']}).json()
+    assert [u['username'] for u in second['item']] == ['reader2', 'testuser']
+    assert second['next_cursor'] is None
+
+    with engine.connect() as conn:
+        conn.execute(text('delete from likes;'))
+        conn.commit()
+
+def test_add_comment_updates_counter(test_user, test_post):
+    response = client.post('/posts/1/comments', json={'content': 'first!'})
+    assert response.status_code == status.HTTP_201_CREATED
+    db = Testsessionlocal()
+    assert db.get(Posts, 1).comment_count == 1
+    with engine.connect() as conn:
+        conn.execute(text('delete from comments;'))
+        conn.commit()
+
+def test_add_comment_missing_post(test_user):
+    response = client.post('/posts/99/comments', json={'content': 'hello?'})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_bulk_create_posts(test_user, test_post):
+    body = '\n'.join([
+        '{"title": "Bulk one", "content": "a"}',
+        'not json',
+        '{"title": "Bulk two"}',
+        '',
+        '{"title": "Bulk three", "content": "c"}',
+    ])
+    response = client.post('/posts/bulk', params={'batch_size': 1}, content=body, headers={'Content-Type': 'application/x-ndjson'})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data['inserted'] == 2
+    assert [err['line'] for err in data['errors']] == [2, 3]
+    db = Testsessionlocal()
+    slugs = db.scalars(select(Posts.slug).where(Posts.title.like('Bulk %'))).all()
+    assert len(slugs) == 2 and all(slug.startswith('bulk-') for slug in slugs)
+
+def test_bulk_add_comments(test_user, test_post):
+    body = '{"content": "one"}\n{"content": "two"}\n{"nope": 1}\n{"content": "three"}\n'
+    response = client.post('/posts/1/comments/bulk', params={'batch_size': 2}, content=body)
+    assert response.json() == {'inserted': 3, 'errors': [{'line': 3, 'error': 'Content: Field required'}]}
+    db = Testsessionlocal()
+    assert db.get(Posts, 1).comment_count == 3
+    with engine.connect() as conn:
+        conn.execute(text('delete from comments;'))
+        conn.commit()
+
+def test_bulk_add_comments_missing_post(test_user):
+    response = client.post('/posts/99/comments/bulk', content='{"content": "hello?"}')
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_reconcile_counters(busy_thread):
+    with engine.connect() as conn:
+        assert reconcile_counters(conn) == 1
+        assert conn.execute(text('select comment_count from posts where id = 1')).scalar() == 5
+        assert reconcile_counters(conn) == 0
+
+def test_get_comments(test_user, test_post, test_comment):
+    response = client.get('/posts/1/comments')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        'limit': 10,
+        'item': [{'id': 1, 'content': 'This is a test comment.', 'user': {'id': 1, 'username': 'testuser'}}],
+        'next_cursor': None,
+        'prev_cursor': None
+    }
+
+def test_get_comments_pagination(busy_thread):
+    first = client.get('/posts/1/comments', params={'limit': 2}).json()
+    assert [c['content'] for c in first['item']] == ['comment 1', 'comment 2']
+    assert first['prev_cursor'] is None
+    second = client.get('/posts/1/comments', params={'limit': 2, 'cursor': first['next_cursor']}).json()
+    assert [c['content'] for c in second['item']] == ['comment 3', 'comment 4']
+    back = client.get('/posts/1/comments', params={'limit': 2, 'cursor': second['prev_cursor']}).json()
+    assert back['item'] == first['item']
+
+    # a new comment lands on the last page, and the cached pages are retired
+    last = client.get('/posts/1/comments', params={'limit': 2, 'cursor': second['next_cursor']}).json()
+    assert [c['content'] for c in last['item']] == ['comment 5']
+    client.post('/posts/1/comments', json={'content': 'comment 6'})
+    last = client.get('/posts/1/comments', params={'limit': 2, 'cursor': second['next_cursor']}).json()
+    assert [c['content'] for c in last['item']] == ['comment 5', 'comment 6']
+
+def test_get_post_embeds_first_comments(busy_thread):
+    post = client.get('/posts/test-post-1', params={'comments_limit': 2}).json()
+    assert [c['content'] for c in post['comments']] == ['comment 1', 'comment 2']
+    rest = client.get('/posts/1/comments', params={'limit': 10, 'cursor': post['comments_next_cursor']}).json()
+    assert [c['content'] for c in rest['item']] == ['comment 3', 'comment 4', 'comment 5']
+    assert client.get('/posts/test-post-1', params={'comments_limit': 0}).json()['comments'] == []
+
+def test_delete_post(test_user, test_post, test_comment):
+    response = client.delete('/posts/1')
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert client.get('/posts/test-post-1').status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.fixture
+def busy_thread(test_user, test_post):
+    db = Testsessionlocal()
+    db.add_all([Users(id=i, username=f'reader{i}', email=f'reader{i}@gmail.com', hashed_password='x') for i in range(2, 6)])
+    db.add_all([Comments(content=f'comment {i}', user_id=i, post_id=1) for i in range(1, 6)])
+    db.commit()
+    yield
+    with engine.connect() as conn:
+        conn.execute(text('delete from comments;'))
+        conn.execute(text('delete from users where id > 1;'))
+        conn.commit()
+
+def test_get_post_query_budget(busy_thread):
+    with count_queries() as statements:
+        response = client.get('/posts/test-post-1')
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()['comments']) == 5
+    assert len(statements) == 2
+
+def test_get_comment_query_budget(busy_thread):
+    with count_queries() as statements:
+        response = client.get('/posts/1/comments')
+    assert len(response.json()['item']) == 5
+    assert len(statements) == 2
 
+def test_get_comments_revalidation_is_single_row(busy_thread):
+    etag = client.get('/posts/1/comments').headers['etag']
+    with count_queries() as statements:
+        response = client.get('/posts/1/comments', headers={'If-None-Match': etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    # no aggregate over the thread, just the counter and the newest comment
+    assert len(statements) == 1 and 'count(' not in statements[0].lower()
 
+    client.post('/posts/1/comments', json={'content': 'newer'})
+    assert client.get('/posts/1/comments', headers={'If-None-Match': etag}).status_code == status.HTTP_200_OK
 
+def test_get_posts_query_budget(busy_thread):
+    with count_queries() as statements:
+        client.get('/posts/')
+    assert len(statements) == 1
@@ -0,0 +1,75 @@
+from utils import *
+from app.replicas import get_read_db
+from fastapi import status
+from app import querylog
+from app.router.admin import get_admin_user
+from app.router.blog import get_db
+from app.router.blog import get_current_user
+from sqlalchemy.engine import Engine
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
+app.dependency_overrides[get_current_user] = override_get_current_user
+
+@pytest.fixture
+def query_log(monkeypatch):
+    monkeypatch.setattr(querylog, 'SLOW_QUERY_MS', 0)
+    querylog.reset()
+    querylog.install()
+    yield
+    event.remove(Engine, 'before_cursor_execute', querylog.before_cursor_execute)
+    event.remove(Engine, 'after_cursor_execute', querylog.after_cursor_execute)
+    querylog.reset()
+
+def test_fingerprint():
+    assert querylog.fingerprint("SELECT * FROM posts WHERE id = 5 AND slug = 'it''s'") == 'SELECT * FROM posts WHERE id = ? AND slug = ?'
+    assert querylog.fingerprint('SELECT x FROM t WHERE id IN (?, ?,  ?)\n LIMIT ?') == 'SELECT x FROM t WHERE id IN (...) LIMIT ?'
+    assert querylog.fingerprint('SELECT a::text FROM t WHERE b = :b') == 'SELECT a::text FROM t WHERE b = ?'
+
+def test_query_stats_and_plan(test_user, test_post, query_log):
+    for _ in range(3):
+        cache.backend.entries.clear()
+        client.get('/posts/1/likes-count')
+    app.dependency_overrides[get_admin_user] = override_get_current_user
+    try:
+        response = client.get('/admin/queries', params={'sort': 'count'})
+    finally:
+        del app.dependency_overrides[get_admin_user]
+    assert response.status_code == status.HTTP_200_OK
+    like_count = next(row for row in response.json()['item'] if 'posts.like_count' in row['statement'])
+    assert like_count['count'] == 3
+    assert like_count['slow_count'] == 3
+    assert like_count['p95_ms'] >= like_count['p50_ms']
+    assert any('posts' in line for line in like_count['plan'])
+
+def test_slow_query_logged_when_table_full(test_user, query_log, monkeypatch, caplog):
+    monkeypatch.setattr(querylog, 'QUERY_LOG_MAX_FINGERPRINTS', 0)
+    with caplog.at_level('WARNING', logger='app.slow_query'):
+        client.get('/posts/1/likes-count')
+    assert any('posts.like_count' in record.getMessage() for record in caplog.records)
+    assert querylog.report() == []
+
+class FailingExplainCursor:
+    def __init__(self, executed):
+        self.executed = executed
+
+    def execute(self, statement, parameters=None):
+        self.executed.append(statement)
+        if statement.startswith('EXPLAIN'):
+            raise RuntimeError('syntax error')
+
+    def close(self):
+        pass
+
+def test_failed_explain_rolls_back_to_savepoint():
+    executed = []
+    class Conn:
+        dialect = type('Dialect', (), {'name': 'postgresql'})
+        connection = type('DBAPIConnection', (), {'cursor': lambda self: FailingExplainCursor(executed)})()
+    plan = querylog.explain(Conn(), 'SELECT 1', ())
+    assert plan == ['explain failed: syntax error']
+    # the request's transaction is left usable
+    assert executed == ['SAVEPOINT querylog_explain', 'EXPLAIN SELECT 1', 'ROLLBACK TO SAVEPOINT querylog_explain', 'RELEASE SAVEPOINT querylog_explain']
+
+def test_admin_queries_forbidden(test_user):
+    assert client.get('/admin/queries').status_code == status.HTTP_403_FORBIDDEN
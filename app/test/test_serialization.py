@@ -0,0 +1,21 @@
+from utils import *
+from datetime import datetime, timezone
+from app import serialization
+from app.serialization import FastJSONResponse, json_response
+from app.router.blog import post_page_adapter
+from sqlalchemy import select
+import json
+
+def test_fast_json_response_encodes_datetimes(monkeypatch):
+    content = {'at': datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc), 'n': 1}
+    fast = json.loads(FastJSONResponse(content).body)
+    monkeypatch.setattr(serialization, 'orjson', None)
+    assert json.loads(FastJSONResponse(content).body) == fast == {'at': '2024-01-02T03:04:05+00:00', 'n': 1}
+
+def test_json_response_validates_rows(test_post):
+    db = Testsessionlocal()
+    rows = db.execute(select(Posts.id, Posts.title, Posts.content, Posts.slug, Posts.is_published, Posts.created_at, Posts.updated_at, Posts.author_id, Posts.like_count, Posts.comment_count)).all()
+    response = json_response(post_page_adapter, {'limit': 10, 'item': rows}, headers={'ETag': '"x"'})
+    assert response.headers['content-type'] == 'application/json'
+    assert response.headers['etag'] == '"x"'
+    assert [post['slug'] for post in json.loads(response.body)['item']] == ['test-post-1']
@@ -1,8 +1,10 @@
 from utils import *
+from app.replicas import get_read_db
 from fastapi import status
 from app.router.user import get_db, get_current_user
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
 app.dependency_overrides[get_current_user] = override_get_current_user
 
 def test_create_user(test_user):
@@ -35,12 +37,18 @@ def test_get_user_post(test_user, test_post):
             'is_published': False,
             'created_at': test_post.created_at.isoformat(),
             'updated_at': test_post.updated_at.isoformat() if test_post.updated_at else None,
-            'author_id': 1
+            'author_id': 1,
+            'like_count': 0,
+            'comment_count': 0
         }
     ]
 
+def test_get_user_post_query_budget(test_user, test_post):
+    with count_queries() as statements:
+        client.get('/users/posts')
+    assert len(statements) == 2
 
-
-
-
-
+def test_get_user_post_sparse_fields(test_user, test_post):
+    response = client.get('/users/posts', params={'fields': 'id,slug,content', 'excerpt': 4})
+    assert response.json() == [{'id': 1, 'slug': 'test-post-1', 'content': 'This'}]
+    assert client.get('/users/posts', params={'fields': 'id,secret'}).status_code == status.HTTP_400_BAD_REQUEST
@@ -1,10 +1,17 @@
+import os
+# keep test hashing cheap instead of calibrating for production latency
+os.environ.setdefault('PASSWORD_BCRYPT_ROUNDS', '4')
+
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine, text
-from sqlalchemy.pool import StaticPool
+from sqlalchemy import create_engine, text, event
+from sqlalchemy.pool import StaticPool, NullPool
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from app.main import app
-from app.models import Base, Users, Posts, Comments
-from app.router.auth import bcrypt_context
+from app.models import Base, Users, Posts, Comments, Likes
+from app.passwords import password_context
+from app import cache
+from contextlib import contextmanager
 import pytest
 
 DATABASE_URL = 'sqlite:///./test.db'
@@ -12,16 +19,39 @@ engine = create_engine(DATABASE_URL, connect_args={'check_same_thread':False}, p
 
 Testsessionlocal = sessionmaker(autoflush=False, autocommit=False, bind=engine)
 
+# TestClient runs every request on a fresh event loop, so async connections
+# must not be pooled across requests
+async_engine = create_async_engine('sqlite+aiosqlite:///./test.db', poolclass=NullPool)
+TestAsyncsessionlocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+
 client = TestClient(app)
 
+Base.metadata.drop_all(bind=engine)
 Base.metadata.create_all(bind=engine)
 
-def override_get_db():
-    db = Testsessionlocal()
-    try:
+async def override_get_db():
+    async with TestAsyncsessionlocal() as db:
         yield db
+
+def override_get_sessionmaker():
+    return TestAsyncsessionlocal
+
+@contextmanager
+def count_queries():
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(async_engine.sync_engine, 'before_cursor_execute', record)
+    try:
+        yield statements
     finally:
-        db.close()
+        event.remove(async_engine.sync_engine, 'before_cursor_execute', record)
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # fixtures rewrite rows behind the API's back, so start every test cold
+    cache.backend.entries.clear()
+    yield
 
 def override_get_current_user():
     return {'id': 1, 'username': 'testuser'}
@@ -31,7 +61,7 @@ def test_user():
     user = Users(
         username='testuser',
         email='test@gmail.com',
-        hashed_password=bcrypt_context.hash('testpassword')
+        hashed_password=password_context.hash('testpassword')
     )
     db = Testsessionlocal()
     db.add(user)
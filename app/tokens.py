@@ -0,0 +1,120 @@
+from collections import OrderedDict
+from threading import Lock
+from jose import jwt, JWTError
+from dotenv import load_dotenv
+from . import metrics
+import hashlib, os, time
+
+load_dotenv()
+SECRET_KEY = os.getenv('SECRET_KEY')
+ALGORITHM = 'HS256'
+# JWT_KEYS="2026-10:secret-a,2026-11:secret-b" lists every key still accepted;
+# JWT_ACTIVE_KID picks the one new tokens are signed with. Without JWT_KEYS
+# the single SECRET_KEY is used under the 'default' kid. Tokens minted before
+# kids existed carry none and are checked against the active key and then
+# SECRET_KEY, so keep SECRET_KEY set until those tokens have expired.
+JWT_KEYS = os.getenv('JWT_KEYS', '')
+JWT_ACTIVE_KID = os.getenv('JWT_ACTIVE_KID')
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+
+cache_hits = metrics.counter('auth_token_cache_hits_total', 'Bearer tokens accepted from the verified-token cache')
+cache_misses = metrics.counter('auth_token_cache_misses_total', 'Bearer tokens that needed a full signature check')
+
+
+def parse_keys(spec:str):
+    keys = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        kid, _, secret = item.partition(':')
+        if not secret:
+            raise ValueError(f'JWT_KEYS entry {kid!r} has no secret')
+        keys[kid] = secret
+    return keys
+
+
+class KeyRing:
+    def __init__(self, keys:dict, active_kid:str, legacy_key:str=None):
+        if active_kid not in keys:
+            raise ValueError(f'active key {active_kid!r} is not in the key ring')
+        self.keys = keys
+        self.active_kid = active_kid
+        self.legacy_key = legacy_key
+
+    @property
+    def active_key(self):
+        return self.keys[self.active_kid]
+
+    def key_for(self, token:str):
+        """The key, or candidate keys, ``token``'s signature may be checked with."""
+        kid = jwt.get_unverified_header(token).get('kid')
+        if kid is None:
+            # minted before kids existed: signed with the key that is active
+            # now or the legacy SECRET_KEY; jwt.decode tries each in turn
+            return [key for key in dict.fromkeys([self.active_key, self.legacy_key]) if key]
+        key = self.keys.get(kid)
+        if key is None:
+            raise JWTError(f'unknown key id {kid!r}')
+        return key
+
+
+class VerifiedTokenCache:
+    """LRU of already-verified tokens, keyed by their SHA-256 and dropped at ``exp``."""
+
+    def __init__(self, max_entries:int=TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, digest:bytes):
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is None:
+                return None
+            expires, claims = entry
+            if expires <= time.time():
+                del self.entries[digest]
+                return None
+            self.entries.move_to_end(digest)
+            return claims
+
+    def put(self, digest:bytes, claims:dict):
+        expires = claims.get('exp')
+        if expires is None:
+            return
+        with self.lock:
+            self.entries[digest] = (expires, claims)
+            self.entries.move_to_end(digest)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def load_key_ring():
+    keys = parse_keys(JWT_KEYS)
+    if not keys:
+        return KeyRing({'default':SECRET_KEY}, 'default')
+    return KeyRing(keys, JWT_ACTIVE_KID or next(iter(keys)), legacy_key=SECRET_KEY)
+
+key_ring = load_key_ring()
+verified_tokens = VerifiedTokenCache()
+
+def encode_token(claims:dict):
+    return jwt.encode(claims, key_ring.active_key, algorithm=ALGORITHM, headers={'kid':key_ring.active_kid})
+
+def decode_token(token:str):
+    """Verify ``token`` and return its claims, raising ``JWTError`` if it is bad.
+
+    Tokens seen before skip the signature check and JSON parsing until their
+    ``exp`` passes.
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    claims = verified_tokens.get(digest)
+    if claims is not None:
+        cache_hits.inc()
+        return claims
+    cache_misses.inc()
+    claims = jwt.decode(token, key_ring.key_for(token), algorithms=[ALGORITHM])
+    verified_tokens.put(digest, claims)
+    return claims
@@ -0,0 +1,92 @@
+"""Concurrent request throughput against the ASGI app.
+
+Seeds a throwaway SQLite database, then fires concurrent GET requests at the
+app in-process and reports requests per second. ``--db-latency-ms`` adds a
+simulated round trip to every statement on the thread that runs it, which is
+what a networked database costs: a sync session pays it on the event loop,
+an async session pays it off the loop.
+
+    python benchmarks/bench_concurrency.py --requests 500 --concurrency 50 --db-latency-ms 2
+"""
+import argparse, asyncio, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--posts', type=int, default=200)
+    parser.add_argument('--db-latency-ms', type=float, default=2.0)
+    return parser.parse_args()
+
+
+def install_latency(database, latency):
+    from sqlalchemy import event
+
+    def delay(statement):
+        time.sleep(latency)
+
+    async_engine = getattr(database, 'async_engine', None)
+    if async_engine is not None:
+        from sqlalchemy.util import await_only
+
+        @event.listens_for(async_engine.sync_engine, 'connect')
+        def on_async_connect(dbapi_connection, record):
+            await_only(dbapi_connection.driver_connection.set_trace_callback(delay))
+
+    @event.listens_for(database.engine, 'connect')
+    def on_connect(dbapi_connection, record):
+        dbapi_connection.set_trace_callback(delay)
+
+
+async def run(app, slugs, total, concurrency):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = []
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def one(i):
+            async with semaphore:
+                response = await client.get(f'/posts/{slugs[i % len(slugs)]}')
+                statuses.append(response.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+    return elapsed, statuses
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from app import database
+    from app.main import app
+    from app.models import Users, Posts
+    from app.limiter import limiter
+    from app.router.auth import get_current_user
+
+    limiter.enabled = False
+    app.dependency_overrides[get_current_user] = lambda: {'id': 1, 'email': 'bench@example.com'}
+
+    db = database.sessionlocal()
+    db.add(Users(id=1, username='bench', email='bench@example.com', hashed_password='x'))
+    db.add_all([Posts(title=f'Post {i}', content='lorem ipsum ' * 50, slug=f'bench-{i}', author_id=1) for i in range(args.posts)])
+    db.commit()
+    db.close()
+    slugs = [f'bench-{i}' for i in range(args.posts)]
+
+    install_latency(database, args.db_latency_ms / 1000)
+    elapsed, statuses = asyncio.run(run(app, slugs, args.requests, args.concurrency))
+    errors = sum(1 for code in statuses if code != 200)
+    print(f'{args.requests} requests, concurrency {args.concurrency}, db latency {args.db_latency_ms}ms')
+    print(f'elapsed {elapsed:.2f}s  {args.requests / elapsed:.1f} req/s  errors {errors}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Per-request overhead of the rate limiter for each storage backend.
+
+Times the fixed-window ``hit`` that slowapi performs on every decorated
+request, spread over ``--keys`` client keys, and reports microseconds per hit.
+Pass extra storage URIs (e.g. a local redis://) to compare them as well.
+
+    python benchmarks/bench_limiter.py --hits 20000 --keys 500 redis://localhost:6379
+"""
+import argparse, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hits', type=int, default=20000)
+    parser.add_argument('--keys', type=int, default=500)
+    parser.add_argument('storages', nargs='*')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp()
+    os.environ.setdefault('SECRET_KEY', 'bench-secret')
+
+    from limits import parse
+    from limits.storage import storage_from_string
+    from limits.strategies import FixedWindowRateLimiter
+    import app.limiter  # registers the sqlite:// storage
+
+    item = parse('1000000/minute')
+    uris = ['memory://', f"sqlite:///{os.path.join(workdir, 'limits.db')}", *args.storages]
+    print(f'{args.hits} hits over {args.keys} keys')
+    for uri in uris:
+        limiter = FixedWindowRateLimiter(storage_from_string(uri))
+        start = time.perf_counter()
+        for i in range(args.hits):
+            limiter.hit(item, f'user:{i % args.keys}')
+        elapsed = time.perf_counter() - start
+        print(f'{uri:<40} {elapsed / args.hits * 1e6:.1f}us/hit')
+
+
+if __name__ == '__main__':
+    main()
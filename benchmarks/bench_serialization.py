@@ -0,0 +1,66 @@
+"""Cost of turning a page of posts into a JSON body, per 1k posts.
+
+Seeds a throwaway SQLite database with ``--posts`` posts and loads them once,
+then times only the encoding step for both paths:
+
+- before: ORM ``Posts`` entities through ``jsonable_encoder`` and
+  ``json.dumps``, which is what FastAPI does for an untyped return value
+- after: ``Row`` tuples validated and dumped by the prebuilt ``PostPage``
+  adapter in ``app.router.blog``
+
+    python benchmarks/bench_serialization.py --posts 1000 --rounds 50
+"""
+import argparse, json, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=50)
+    return parser.parse_args()
+
+
+def timed(rounds, encode):
+    encode()  # warm up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        body = encode()
+    return (time.perf_counter() - start) / rounds, len(body)
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault('SECRET_KEY', 'bench-secret')
+
+    from sqlalchemy import select
+    from fastapi.encoders import jsonable_encoder
+    from app import database
+    from app.models import Base, Users, Posts
+    from app.router.blog import PostSummary, post_page_adapter
+    from app.serialization import json_response
+
+    Base.metadata.create_all(bind=database.engine)
+    db = database.sessionlocal()
+    db.add(Users(id=1, username='bench', email='bench@example.com', hashed_password='x'))
+    db.add_all([Posts(title=f'Benchmark post {i}', content='lorem ipsum ' * 40, author_id=1) for i in range(args.posts)])
+    db.commit()
+
+    entities = db.scalars(select(Posts)).all()
+    rows = db.execute(select(*PostSummary.columns)).all()
+    page = {'limit':args.posts, 'next_cursor':None, 'prev_cursor':None}
+
+    before, size = timed(args.rounds, lambda: json.dumps(jsonable_encoder({**page, 'item':entities})).encode())
+    after, _ = timed(args.rounds, lambda: json_response(post_page_adapter, {**page, 'item':rows}).body)
+    scale = 1000 / args.posts
+    print(f'{args.posts} posts, {size / 1024:.0f} KiB body, {args.rounds} rounds')
+    print(f'{"before (ORM + jsonable_encoder)":<36} {before * scale * 1000:.2f}ms/1k posts')
+    print(f'{"after (Row + TypeAdapter)":<36} {after * scale * 1000:.2f}ms/1k posts')
+    print(f'speedup {before / after:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Post insert throughput with slugs generated on flush.
+
+Seeds a throwaway SQLite database with one user and inserts ``--posts`` posts
+through the ORM in ``add_all`` batches, leaving ``slug`` unset so every row
+goes through the ``before_insert`` slug listener. Reports posts per second
+and checks every generated slug is distinct.
+
+    python benchmarks/bench_slugs.py --posts 100000 --batch-size 1000
+"""
+import argparse, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=100_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from sqlalchemy import select, func
+    from app import database
+    from app.models import Base, Users, Posts
+    import app.router.blog  # registers the slug listener
+
+    Base.metadata.create_all(bind=database.engine)
+    db = database.sessionlocal()
+    db.add(Users(id=1, username='bench', email='bench@example.com', hashed_password='x'))
+    db.commit()
+
+    start = time.perf_counter()
+    for offset in range(0, args.posts, args.batch_size):
+        count = min(args.batch_size, args.posts - offset)
+        db.add_all([Posts(title=f'Benchmark post {offset + i}', content='lorem ipsum', author_id=1) for i in range(count)])
+        db.commit()
+    elapsed = time.perf_counter() - start
+
+    distinct = db.scalar(select(func.count(func.distinct(Posts.slug))))
+    db.close()
+    print(f'{args.posts} posts, batch size {args.batch_size}')
+    print(f'elapsed {elapsed:.2f}s  {args.posts / elapsed:.0f} posts/s  distinct slugs {distinct}')
+
+
+if __name__ == '__main__':
+    main()
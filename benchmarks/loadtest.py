@@ -0,0 +1,198 @@
+"""End-to-end load test against a locally launched uvicorn.
+
+Seeds a fresh SQLite database (see ``seed.py``), starts uvicorn on it with
+rate limiting off, logs in a pool of users and then drives a weighted mix of
+every router endpoint from ``--concurrency`` async clients. Per-endpoint
+p50/p99 latency, RPS and error counts are printed and written as JSON, tagged
+with the current git commit, so runs can be diffed across commits.
+
+    python benchmarks/loadtest.py --users 1000 --posts 100000 --requests 20000 --concurrency 64 --out results.json
+
+``--database-url`` skips seeding and runs against an existing database.
+"""
+import argparse, asyncio, json, os, random, socket, subprocess, sys, tempfile, time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = [
+    # (name, weight)
+    ('list_posts', 20),
+    ('get_post', 30),
+    ('get_comments', 15),
+    ('likes_count', 15),
+    ('toggle_like', 8),
+    ('add_comment', 5),
+    ('user_posts', 5),
+    ('login', 2),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--comments-per-post', type=int, default=3)
+    parser.add_argument('--likes-per-post', type=int, default=5)
+    parser.add_argument('--database-url')
+    parser.add_argument('--password', default='benchpassword')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--logins', type=int, default=20, help='distinct users to hold tokens for')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--out', default='loadtest-results.json')
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def wait_healthy(client, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get('/')).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError('uvicorn did not become healthy')
+
+
+async def drive(base_url, args, users, posts):
+    import httpx
+
+    rng = random.Random(7)
+    names = [name for name, _ in SCENARIOS]
+    weights = [weight for _, weight in SCENARIOS]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await wait_healthy(client)
+
+        async def login(user_id):
+            response = await client.post('/auth/token', data={'username': f'user{user_id}@example.com', 'password': args.password})
+            response.raise_for_status()
+            return {'Authorization': f"Bearer {response.json()['access_token']}"}
+
+        tokens = await asyncio.gather(*(login(user_id) for user_id in rng.sample(range(1, users + 1), min(args.logins, users))))
+
+        def request_for(name):
+            headers = rng.choice(tokens)
+            post_id = rng.randint(1, posts)
+            if name == 'list_posts':
+                return client.get('/posts/', params={'limit': 20}, headers=headers)
+            if name == 'get_post':
+                return client.get(f'/posts/seed-post-{post_id}', headers=headers)
+            if name == 'get_comments':
+                return client.get(f'/posts/{post_id}/comments', headers=headers)
+            if name == 'likes_count':
+                return client.get(f'/posts/{post_id}/likes-count', headers=headers)
+            if name == 'toggle_like':
+                return client.post(f'/posts/{post_id}/like', headers=headers)
+            if name == 'add_comment':
+                return client.post(f'/posts/{post_id}/comments', json={'content': 'load test comment'}, headers=headers)
+            if name == 'user_posts':
+                return client.get('/users/posts', headers=headers)
+            return client.post('/auth/token', data={'username': f'user{rng.randint(1, users)}@example.com', 'password': args.password})
+
+        plan = rng.choices(names, weights, k=args.requests)
+        queue = asyncio.Queue()
+        for name in plan:
+            queue.put_nowait(name)
+
+        async def worker():
+            while not queue.empty():
+                name = queue.get_nowait()
+                started = time.perf_counter()
+                try:
+                    response = await request_for(name)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                samples[name].append(time.perf_counter() - started)
+                errors[name] += failed
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    def summary(latencies, failures):
+        ordered = sorted(latencies)
+        return {
+            'requests': len(ordered),
+            'errors': failures,
+            'rps': round(len(ordered) / elapsed, 1),
+            'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+            'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+        }
+
+    results = {name: summary(samples[name], errors[name]) for name in names}
+    results['total'] = summary([s for name in names for s in samples[name]], sum(errors.values()))
+    return elapsed, results
+
+
+def main():
+    args = parse_args()
+    env = dict(os.environ, RATE_LIMIT_ENABLED='false')
+    env.setdefault('SECRET_KEY', 'loadtest-secret')
+
+    if args.database_url:
+        env['DATABASE_URL'] = args.database_url
+    else:
+        workdir = tempfile.mkdtemp()
+        env['DATABASE_URL'] = os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+        from seed import seed
+        from app.database import engine
+        started = time.perf_counter()
+        counts = seed(engine, args.users, args.posts, args.comments_per_post, args.likes_per_post, password=args.password)
+        print(f'seeded {counts} in {time.perf_counter() - started:.1f}s')
+        engine.dispose()
+
+    port = args.port or free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(port), '--workers', str(args.workers), '--log-level', 'warning'],
+        cwd=ROOT, env=env,
+    )
+    try:
+        elapsed, results = asyncio.run(drive(f'http://127.0.0.1:{port}', args, args.users, args.posts))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'config': {key: value for key, value in vars(args).items() if key not in ('password', 'out')},
+        'elapsed_s': round(elapsed, 2),
+        'results': results,
+    }
+    with open(args.out, 'w') as output:
+        json.dump(report, output, indent=2)
+
+    for name, row in results.items():
+        print(f"{name:<14} {row['requests']:>7} req  {row['rps']:>8.1f} rps  p50 {row['p50_ms']:>8.2f}ms  p99 {row['p99_ms']:>8.2f}ms  errors {row['errors']}")
+    print(f'wrote {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Seed a database with a large synthetic dataset using batched Core inserts.
+
+Every user gets the same password (``--password``) so load tests can log in
+as anyone; it is hashed once. Likes are distinct per (user, post) and the
+post counters are reconciled at the end.
+
+    DATABASE_URL=sqlite:///./bench.db python benchmarks/seed.py --users 10000 --posts 1000000
+"""
+import argparse, os, random, sys, time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--comments-per-post', type=int, default=3)
+    parser.add_argument('--likes-per-post', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--password', default='benchpassword')
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(engine, users:int, posts:int, comments_per_post:int=3, likes_per_post:int=5, batch_size:int=5000, password:str='benchpassword', seed:int=1):
+    """Insert the dataset through ``engine`` and return row counts per table."""
+    from sqlalchemy import insert
+    from app.models import Base, Users, Posts, Comments, Likes
+    from app.passwords import password_context
+    from app.cli import reconcile_counters
+    import app.search  # registers the FTS table and triggers with create_all
+
+    rng = random.Random(seed)
+    Base.metadata.create_all(bind=engine)
+    hashed = password_context.hash(password)
+    start = datetime.now(timezone.utc) - timedelta(seconds=posts)
+
+    def user_rows():
+        for i in range(1, users + 1):
+            yield {'id':i, 'username':f'user{i}', 'email':f'user{i}@example.com', 'hashed_password':hashed}
+
+    def post_rows():
+        for i in range(1, posts + 1):
+            yield {
+                'id':i,
+                'title':f'Post {i} about {rng.choice(["python", "databases", "gardening", "travel", "music"])}',
+                'content':'lorem ipsum dolor sit amet ' * rng.randint(5, 50),
+                'slug':f'seed-post-{i}',
+                'is_published':rng.random() < 0.8,
+                'created_at':start + timedelta(seconds=i),
+                'author_id':rng.randint(1, users),
+            }
+
+    def comment_rows():
+        for post_id in range(1, posts + 1):
+            for _ in range(comments_per_post):
+                yield {'content':'nice post ' * rng.randint(1, 10), 'user_id':rng.randint(1, users), 'post_id':post_id}
+
+    def like_rows():
+        for post_id in range(1, posts + 1):
+            for user_id in rng.sample(range(1, users + 1), min(likes_per_post, users)):
+                yield {'user_id':user_id, 'post_id':post_id}
+
+    counts = {}
+    with engine.connect() as conn:
+        for name, table, rows in [('users', Users, user_rows()), ('posts', Posts, post_rows()), ('comments', Comments, comment_rows()), ('likes', Likes, like_rows())]:
+            counts[name] = 0
+            for batch in batched(rows, batch_size):
+                conn.execute(insert(table.__table__), batch)
+                conn.commit()
+                counts[name] += len(batch)
+        reconcile_counters(conn, batch_size)
+    return counts
+
+
+def main():
+    args = parse_args()
+    from app.database import engine
+
+    started = time.perf_counter()
+    counts = seed(engine, args.users, args.posts, args.comments_per_post, args.likes_per_post, args.batch_size, args.password, args.seed)
+    elapsed = time.perf_counter() - started
+    print(' '.join(f'{name}={count}' for name, count in counts.items()) + f'  in {elapsed:.1f}s')
+
+
+if __name__ == '__main__':
+    main()